@@ -0,0 +1,307 @@
+"""
+Materialized analytics - running totals maintained as rows are written
+
+Every write of students/recommendations also adds its counts and sums to the
+single analytics_summary row and to per-country minute/hour/day rollups, in
+the same transaction, so /analytics and /analytics/timeseries never
+aggregate the raw tables.
+
+Rebuild the summary and rollups from the raw tables (e.g. after restoring a backup):
+    python analytics.py rebuild
+"""
+import sys
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, func, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from catalog import catalog
+from models import AnalyticsRollup, AnalyticsSummary, Recommendation, Student, University
+
+SUMMARY_ID = 1
+
+ROLLUP_BUCKETS = ("minute", "hour", "day")
+
+# Country recorded for recommendations whose university is not in the catalog
+UNKNOWN_COUNTRY = "Unknown"
+
+# Shown while there is no data yet (same values /analytics always fell back to)
+DEFAULT_ANALYTICS = {
+    "total_students": 1247,
+    "avg_roi": 84.0,
+    "visa_success": 78.0,
+    "high_risk_cases": 18,
+    "scholarship_success": 62.0
+}
+
+
+def analytics_delta(students: int, recommendation_rows: Iterable[dict]) -> dict:
+    """Increments to the summary for a batch of written rows"""
+    delta = {
+        "total_students": students,
+        "total_recommendations": 0,
+        "roi_sum": 0.0,
+        "visa_success_sum": 0.0,
+        "high_risk_count": 0,
+    }
+    for row in recommendation_rows:
+        delta["total_recommendations"] += 1
+        delta["roi_sum"] += row["roi_score"]
+        delta["visa_success_sum"] += row["visa_success"]
+        if row["risk_level"] == "High":
+            delta["high_risk_count"] += 1
+    return delta
+
+
+def summary_update(delta: dict):
+    """UPDATE statement adding a delta; execute it before committing the rows it counts"""
+    return (
+        update(AnalyticsSummary)
+        .where(AnalyticsSummary.id == SUMMARY_ID)
+        .values({
+            getattr(AnalyticsSummary, column): getattr(AnalyticsSummary, column) + value
+            for column, value in delta.items()
+        })
+    )
+
+
+def bucket_start(moment: datetime, bucket: str) -> datetime:
+    """Start of the minute/hour/day bucket containing a naive UTC datetime"""
+    moment = moment.replace(second=0, microsecond=0)
+    if bucket in ("hour", "day"):
+        moment = moment.replace(minute=0)
+    if bucket == "day":
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def utc_now() -> datetime:
+    """Naive UTC now, the form created_at columns are stored and bucketed in"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def rollup_params(recommendation_rows: Iterable[dict], now: Optional[datetime] = None) -> List[dict]:
+    """
+    Rollup increments for written rows, one per bucket and university country
+    Rows are bucketed by their created_at (when the request was served, for
+    rows written behind), falling back to `now` for rows without one.
+    """
+    now = now or utc_now()
+    totals = {}
+    for row in recommendation_rows:
+        country = catalog.country_of(row["university_id"]) or UNKNOWN_COUNTRY
+        moment = row.get("created_at") or now
+        for bucket in ROLLUP_BUCKETS:
+            entry = totals.setdefault((bucket, bucket_start(moment, bucket), country), [0, 0.0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += row["roi_score"]
+            entry[2] += row["visa_success"]
+            entry[3] += 1 if row["risk_level"] == "High" else 0
+
+    return [
+        {
+            "bucket": bucket,
+            "bucket_start": start,
+            "country": country,
+            "recommendations": count,
+            "roi_sum": roi_sum,
+            "visa_success_sum": visa_success_sum,
+            "high_risk_count": high_risk_count,
+        }
+        for (bucket, start, country), (count, roi_sum, visa_success_sum, high_risk_count) in totals.items()
+    ]
+
+
+def rollup_upsert():
+    """INSERT ... ON CONFLICT statement adding rollup increments to existing buckets"""
+    statement = sqlite_insert(AnalyticsRollup)
+    return statement.on_conflict_do_update(
+        index_elements=["bucket", "bucket_start", "country"],
+        set_={
+            column: getattr(AnalyticsRollup, column) + getattr(statement.excluded, column)
+            for column in ("recommendations", "roi_sum", "visa_success_sum", "high_risk_count")
+        }
+    )
+
+
+def analytics_writes(students: int, recommendation_rows: List[dict]) -> List[Tuple[object, Optional[List[dict]]]]:
+    """
+    (statement, params) pairs that record written rows in the summary and rollups
+    Execute them in the same transaction as the rows, before committing.
+    """
+    writes = [(summary_update(analytics_delta(students, recommendation_rows)), None)]
+    params = rollup_params(recommendation_rows)
+    if params:
+        writes.append((rollup_upsert(), params))
+    return writes
+
+
+def record_analytics(db, students: int, recommendation_rows: List[dict]):
+    """Run analytics_writes() on a sync session"""
+    for statement, params in analytics_writes(students, recommendation_rows):
+        db.execute(statement, params)
+
+
+def rebuild_summary(db) -> AnalyticsSummary:
+    """Recompute the summary row from the raw tables"""
+    total_students = db.query(func.count(Student.id)).scalar() or 0
+    total_recommendations, roi_sum, visa_success_sum = db.query(
+        func.count(Recommendation.id),
+        func.coalesce(func.sum(Recommendation.roi_score), 0.0),
+        func.coalesce(func.sum(Recommendation.visa_success), 0.0)
+    ).one()
+    high_risk_count = db.query(func.count(Recommendation.id)).filter(
+        Recommendation.risk_level == "High"
+    ).scalar() or 0
+
+    summary = db.get(AnalyticsSummary, SUMMARY_ID) or AnalyticsSummary(id=SUMMARY_ID)
+    summary.total_students = total_students
+    summary.total_recommendations = total_recommendations
+    summary.roi_sum = roi_sum
+    summary.visa_success_sum = visa_success_sum
+    summary.high_risk_count = high_risk_count
+    db.add(summary)
+    db.commit()
+    return summary
+
+
+def rebuild_rollups(db) -> int:
+    """Recompute every rollup bucket from the raw recommendations; returns the row count"""
+    formats = {
+        "minute": "%Y-%m-%d %H:%M:00",
+        "hour": "%Y-%m-%d %H:00:00",
+        "day": "%Y-%m-%d 00:00:00",
+    }
+    db.query(AnalyticsRollup).delete()
+    written = 0
+    for bucket, fmt in formats.items():
+        start = func.strftime(fmt, Recommendation.created_at)
+        country = func.coalesce(University.country, UNKNOWN_COUNTRY)
+        rows = (
+            db.query(
+                start,
+                country,
+                func.count(Recommendation.id),
+                func.sum(Recommendation.roi_score),
+                func.sum(Recommendation.visa_success),
+                func.sum(case((Recommendation.risk_level == "High", 1), else_=0))
+            )
+            .select_from(Recommendation)
+            .outerjoin(University, University.id == Recommendation.university_id)
+            .group_by(start, country)
+            .all()
+        )
+        params = [
+            {
+                "bucket": bucket,
+                "bucket_start": datetime.strptime(bucket_key, "%Y-%m-%d %H:%M:%S"),
+                "country": country_name,
+                "recommendations": count,
+                "roi_sum": roi_sum or 0.0,
+                "visa_success_sum": visa_success_sum or 0.0,
+                "high_risk_count": high_risk_count or 0,
+            }
+            for bucket_key, country_name, count, roi_sum, visa_success_sum, high_risk_count in rows
+            if bucket_key is not None
+        ]
+        if params:
+            db.execute(rollup_upsert(), params)
+        written += len(params)
+    db.commit()
+    return written
+
+
+def ensure_summary(db):
+    """Create the summary row from existing data if it does not exist yet"""
+    if db.get(AnalyticsSummary, SUMMARY_ID) is None:
+        rebuild_summary(db)
+
+
+def summary_to_response(summary) -> dict:
+    """Format summary totals like the original full-table aggregates"""
+    if summary is None:
+        return dict(DEFAULT_ANALYTICS)
+
+    total_students = summary.total_students
+    count = summary.total_recommendations
+
+    avg_roi = round(summary.roi_sum / count, 2) if count and summary.roi_sum else 84.0
+    visa_success = round(summary.visa_success_sum / count, 2) if count and summary.visa_success_sum else 78.0
+
+    high_risk_cases = round(
+        (summary.high_risk_count / total_students * 100) if total_students > 0 else 0, 2
+    )
+
+    return {
+        "total_students": total_students if total_students > 0 else 1247,
+        "avg_roi": avg_roi,
+        "visa_success": visa_success,
+        "high_risk_cases": int(high_risk_cases) if high_risk_cases > 0 else 18,
+        "scholarship_success": 62.0
+    }
+
+
+def read_summary(db) -> dict:
+    """Current analytics, read from the summary row in O(1)"""
+    return summary_to_response(db.get(AnalyticsSummary, SUMMARY_ID))
+
+
+def read_timeseries(db, start: datetime, end: datetime, bucket: str,
+                    country: Optional[str] = None, combined: bool = False) -> List[dict]:
+    """
+    Rollup points with start <= bucket_start < end, oldest first
+    With a country, one point per bucket for that country. Without one, a
+    point per bucket and country, or one per bucket summed over all
+    countries (country None) when combined.
+    """
+    per_country = not country and not combined
+    group = (AnalyticsRollup.bucket_start, AnalyticsRollup.country) if per_country else (AnalyticsRollup.bucket_start,)
+    query = db.query(
+        *group,
+        func.sum(AnalyticsRollup.recommendations),
+        func.sum(AnalyticsRollup.roi_sum),
+        func.sum(AnalyticsRollup.visa_success_sum),
+        func.sum(AnalyticsRollup.high_risk_count)
+    ).filter(
+        AnalyticsRollup.bucket == bucket,
+        AnalyticsRollup.bucket_start >= start,
+        AnalyticsRollup.bucket_start < end
+    )
+    if country:
+        query = query.filter(func.lower(AnalyticsRollup.country) == country.lower())
+    rows = query.group_by(*group).order_by(*group).all()
+
+    points = []
+    for row in rows:
+        bucket_start_value, point_country = (row[0], row[1]) if per_country else (row[0], country)
+        count, roi_sum, visa_success_sum, high_risk_count = row[len(group):]
+        if not count:
+            continue
+        points.append({
+            "bucket_start": bucket_start_value,
+            "country": point_country,
+            "recommendations": count,
+            "avg_roi": round(roi_sum / count, 2),
+            "visa_success": round(visa_success_sum / count, 2),
+            "high_risk_share": round(high_risk_count / count * 100, 2),
+        })
+    return points
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, init_db
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python analytics.py rebuild")
+        sys.exit(1)
+
+    init_db()
+    db = SessionLocal()
+    try:
+        summary = rebuild_summary(db)
+        rollups = rebuild_rollups(db)
+        print(f"Rebuilt analytics: {summary.total_students} students, "
+              f"{summary.total_recommendations} recommendations, {rollups} rollup rows")
+    finally:
+        db.close()
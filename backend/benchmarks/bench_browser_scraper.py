@@ -0,0 +1,99 @@
+"""
+Playwright scraping: fresh browser per scrape vs the shared page pool
+
+Fixture pages are written to a temporary directory and loaded over file://,
+each with card markup plus image and font references (blocked by the pool).
+The baseline mirrors the original scraper: launch Chromium, open one page,
+and read three fields per card with separate inner_text() awaits.
+
+Needs a Chromium build for Playwright (python -m playwright install chromium).
+
+    python benchmarks/bench_browser_scraper.py --pages 8 --cards 200 --pool 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playwright.async_api import async_playwright  # noqa: E402
+
+from scraper.browser_pool import BrowserPool  # noqa: E402
+from scraper.university_scraper import CARD_SELECTOR, scrape_pages  # noqa: E402
+
+CARD = """<div class="card"><img src="logo-{index}.png">
+<h3>University {index}</h3><span class="country">Canada</span><span class="program">Computer Science</span></div>"""
+
+PAGE = """<html><head><style>@font-face {{ font-family: F; src: url(font.woff2); }} body {{ font-family: F; }}</style></head>
+<body>{cards}</body></html>"""
+
+
+def write_fixtures(directory: Path, pages: int, cards: int):
+    urls = []
+    for page in range(pages):
+        path = directory / f"page-{page}.html"
+        path.write_text(PAGE.format(cards="".join(CARD.format(index=page * cards + i) for i in range(cards))))
+        urls.append(path.as_uri())
+    return urls
+
+
+async def scrape_baseline(urls):
+    scraped = []
+    for url in urls:
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            page = await browser.new_page()
+            await page.goto(url, timeout=60000)
+            await page.wait_for_load_state("networkidle")
+            for card in await page.query_selector_all(CARD_SELECTOR):
+                name = await card.query_selector("h3")
+                country = await card.query_selector(".country")
+                program = await card.query_selector(".program")
+                scraped.append({
+                    "name": await name.inner_text() if name else None,
+                    "country": await country.inner_text() if country else None,
+                    "program": await program.inner_text() if program else None,
+                })
+            await browser.close()
+    return scraped
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--cards", type=int, default=200, help="cards per page")
+    parser.add_argument("--pool", type=int, default=4, help="pages in the browser pool")
+    parser.add_argument("--rounds", type=int, default=3, help="scrapes per mode (the pool is reused across them)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        urls = write_fixtures(Path(directory), args.pages, args.cards)
+        expected = args.pages * args.cards
+
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            baseline = await scrape_baseline(urls)
+        baseline_seconds = (time.perf_counter() - started) / args.rounds
+
+        pool = BrowserPool(size=args.pool)
+        try:
+            started = time.perf_counter()
+            for _ in range(args.rounds):
+                pooled = await scrape_pages(urls, pool)
+            pooled_seconds = (time.perf_counter() - started) / args.rounds
+        finally:
+            await pool.close()
+
+    assert len(baseline) == len(pooled) == expected
+    assert sorted(c["name"] for c in baseline) == sorted(c["name"] for c in pooled)
+    print(f"{'mode':<28}{'seconds/scrape':>16}{'cards/s':>12}")
+    print(f"{'fresh browser, inner_text':<28}{baseline_seconds:>16.3f}{expected / baseline_seconds:>12.0f}")
+    print(f"{'pool, one evaluate/page':<28}{pooled_seconds:>16.3f}{expected / pooled_seconds:>12.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+"""
+Per-request saving from precomputed static score components
+
+Compares scoring against catalog columns with and without the
+student-independent terms (ROI, employability, visa success and their
+final_score / ai_confidence parts) recomputed on every request.
+
+    python benchmarks/bench_precompute.py --rows 100000 --requests 200
+"""
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import synthetic_records  # noqa: E402
+from scoring import UniversityColumns, score_universities, static_components, top_k_indices  # noqa: E402
+
+
+def _student(i: int):
+    return SimpleNamespace(
+        cgpa=6.5 + (i % 7) * 0.5,
+        ielts=6.0 + (i % 4) * 0.5,
+        budget=15000 + (i % 10) * 3000,
+        country=("Canada", "UK", "Germany", "India")[i % 4],
+    )
+
+
+def _run(cols: UniversityColumns, requests: int, recompute: bool) -> float:
+    started = time.perf_counter()
+    for i in range(requests):
+        if recompute:
+            # What every request paid before the terms were stored on the catalog
+            for name, values in static_components(cols).items():
+                setattr(cols, name, values)
+        scores = score_universities(_student(i), cols)
+        top_k_indices(scores["final_score"], 5)
+    return (time.perf_counter() - started) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    cols = UniversityColumns(synthetic_records(args.rows))
+    _run(cols, 5, recompute=False)  # warm-up
+
+    recomputed = _run(cols, args.requests, recompute=True)
+    precomputed = _run(cols, args.requests, recompute=False)
+
+    print(f"catalog rows:            {args.rows}")
+    print(f"recomputed per request:  {recomputed * 1000:.3f} ms")
+    print(f"precomputed:             {precomputed * 1000:.3f} ms")
+    print(f"saving per request:      {(recomputed - precomputed) * 1000:.3f} ms "
+          f"({(1 - precomputed / recomputed) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
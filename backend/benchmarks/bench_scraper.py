@@ -0,0 +1,109 @@
+"""
+Scraper throughput against local fixture HTTP servers
+
+Each fixture server is a distinct host (127.0.0.1:<port>) serving university
+pages in the data-field format, with a fixed latency and an optional share of
+503 responses to exercise retries. The per-host rate limit stays fixed, so
+throughput should grow with the number of hosts. Targets are listed either
+interleaved across hosts or grouped by host; the scraper schedules per host,
+so both orders should scrape at the same rate.
+
+    python benchmarks/bench_scraper.py --pages 40 --hosts 1 2 4 --rate 10
+"""
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# The scraper/ package shadows scraper.py, so load the module from its file
+_spec = importlib.util.spec_from_file_location("requests_scraper", os.path.join(BACKEND_DIR, "scraper.py"))
+_module = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_module)
+UniversityScraper, parse_university_page = _module.UniversityScraper, _module.parse_university_page
+
+PAGE = """<html><body><div class="university">
+<h1 data-field="name">{name}</h1>
+<span data-field="country">{country}</span>
+<span data-field="program">Computer Science</span>
+<span data-field="tuition">{tuition}</span>
+<span data-field="ranking">{ranking}</span>
+<span data-field="scholarship_available">yes</span>
+</div></body></html>"""
+
+
+def fixture_server(latency: float, error_rate: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            if random.random() < error_rate:
+                self.send_response(503)
+                self.end_headers()
+                return
+            index = int(self.path.rsplit("/", 1)[-1])
+            body = PAGE.format(name=f"University {index}", country="Canada",
+                               tuition=20000 + index, ranking=index + 1).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(pages: int, hosts: int, order: str, rate: float, workers: int, latency: float, error_rate: float):
+    servers = [fixture_server(latency, error_rate) for _ in range(hosts)]
+    # Interleaved: host 0, 1, 0, 1, ...; grouped: all of host 0's pages, then host 1's
+    per_host = -(-pages // hosts)
+    host_of = (lambda i: i % hosts) if order == "interleaved" else (lambda i: i // per_host)
+    targets = [
+        (f"University {i}", "Canada", f"http://127.0.0.1:{servers[host_of(i)].server_port}/university/{i}")
+        for i in range(pages)
+    ]
+    scraper = UniversityScraper(requests_per_second=rate, max_workers=workers, backoff_base=0.05)
+    started = time.perf_counter()
+    results = scraper.scrape_many(targets)
+    elapsed = time.perf_counter() - started
+    for server in servers:
+        server.shutdown()
+
+    scraped = [data for _, data in results if data]
+    assert all(data["tuition"] == 20000 + int(data["name"].split()[-1]) for data in scraped)
+    print(f"{hosts:>6}{order:>13}{len(scraped):>10}/{pages:<6}{elapsed:>10.2f}{len(scraped) / elapsed:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--hosts", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--order", nargs="+", choices=["interleaved", "grouped"],
+                        default=["interleaved", "grouped"], help="how targets are listed across hosts")
+    parser.add_argument("--rate", type=float, default=10.0, help="requests per second per host")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="server response time in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.1, help="share of 503 responses")
+    args = parser.parse_args()
+
+    # Sanity check of the page format before timing anything
+    assert parse_university_page(PAGE.format(name="X", country="Y", tuition=1, ranking=2))["ranking"] == 2
+
+    print(f"{'hosts':>6}{'order':>13}{'scraped':>17}{'seconds':>10}{'pages/s':>12}")
+    for hosts in args.hosts:
+        for order in args.order:
+            run(args.pages, hosts, order, args.rate, args.workers, args.latency, args.error_rate)
+
+
+if __name__ == "__main__":
+    main()
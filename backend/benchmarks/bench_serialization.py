@@ -0,0 +1,79 @@
+"""
+Serialization cost per endpoint: default FastAPI path vs fast JSON mode
+
+Default: response_model validation (where the endpoint declares one) and
+jsonable_encoder via fastapi.routing.serialize_response, then JSONResponse.
+Fast: ORJSONResponse straight from the dicts (EDUINTEL_FAST_JSON=1).
+
+    python benchmarks/bench_serialization.py --universities 100000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from synthetic import synthetic_records  # noqa: E402
+from engine import format_recommendations, score_recommendations  # noqa: E402
+from models import RecommendationResponse  # noqa: E402
+from scoring import UniversityColumns  # noqa: E402
+
+
+async def _default_body(field, payload) -> bytes:
+    content = await serialize_response(field=field, response_content=payload)
+    return JSONResponse(content).body
+
+
+def _fast_body(payload) -> bytes:
+    return ORJSONResponse(payload).body
+
+
+async def _measure(name: str, field, payload, repeat: int):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        default_body = await _default_body(field, payload)
+    default_cost = (time.perf_counter() - started) / repeat
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fast_body = _fast_body(payload)
+    fast_cost = (time.perf_counter() - started) / repeat
+
+    print(f"{name:<28}{default_cost * 1e6:>14.1f}{fast_cost * 1e6:>14.1f}"
+          f"{default_cost / fast_cost:>9.1f}x{len(default_body):>12}{len(fast_body):>12}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--universities", type=int, default=100000, help="rows in the /universities listing")
+    parser.add_argument("--repeat", type=int, default=2000, help="iterations for the /recommend payload")
+    args = parser.parse_args()
+
+    records = synthetic_records(max(args.universities, 100))
+    student = SimpleNamespace(cgpa=8.5, ielts=7.5, budget=35000, country="Canada", field="Computer Science")
+    recommend_payload = format_recommendations(score_recommendations(student, UniversityColumns(records[:1000])))
+    listing_payload = [
+        {"id": u.id, "name": u.name, "country": u.country, "program": u.program,
+         "tuition": u.tuition, "ranking": u.ranking}
+        for u in records[:args.universities]
+    ]
+
+    print(f"{'endpoint':<28}{'default us':>14}{'fast us':>14}{'speedup':>10}{'bytes':>12}{'fast bytes':>12}")
+    await _measure("POST /recommend (5 items)",
+                   create_response_field(name="response", type_=List[RecommendationResponse]),
+                   recommend_payload, args.repeat)
+    # /universities has no response_model, so the default path is jsonable_encoder only
+    await _measure(f"GET /universities ({args.universities})", None, listing_payload,
+                   max(1, args.repeat // max(1, args.universities // 100)))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
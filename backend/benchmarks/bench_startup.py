@@ -0,0 +1,82 @@
+"""
+Cold start time by catalog size: SQL rebuild vs mapped catalog snapshot
+
+For each size a temporary database is seeded with a synthetic catalog, then a
+fresh interpreter imports main and runs its startup handler three ways:
+- sql: no snapshot (EDUINTEL_CATALOG_SNAPSHOT=""), catalog built from the table
+- rebuild: snapshot missing or stale, rebuilt from the table and written
+- mapped: current snapshot, only mapped
+
+    python benchmarks/bench_startup.py --sizes 10000 100000 500000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import synthetic_universities  # noqa: E402
+
+SNAPSHOT = "eduintel-catalog.bin"
+
+STARTUP = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.startup_event()
+print(json.dumps({"import": imported - started, "startup": time.perf_counter() - imported,
+                  "rows": len(main.catalog.records)}))
+"""
+
+
+def seed(directory: str, size: int):
+    code = (
+        "import json, sys\n"
+        "from database import SessionLocal, init_db\n"
+        "from data import upsert_universities\n"
+        "init_db()\n"
+        "rows = [json.loads(line) for line in sys.stdin]\n"
+        "with SessionLocal() as db:\n"
+        "    upsert_universities(db, rows)\n"
+    )
+    rows = "\n".join(
+        json.dumps({key: value for key, value in row.items() if key != "id"})
+        for row in synthetic_universities(size)
+    )
+    subprocess.run([sys.executable, "-c", code], input=rows, text=True, cwd=directory, check=True,
+                   env=dict(os.environ, PYTHONPATH=BACKEND_DIR, EDUINTEL_CATALOG_SNAPSHOT=""))
+
+
+def cold_start(directory: str, snapshot: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, EDUINTEL_CATALOG_SNAPSHOT=snapshot)
+    env.pop("EDUINTEL_SHARED_CATALOG", None)
+    # Script on stdin rather than -c: with -c, load_dotenv() looks for .env in the temporary cwd
+    result = subprocess.run([sys.executable, "-"], input=STARTUP, cwd=directory, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 500000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}{'mode':>10}{'import s':>12}{'startup s':>12}{'snapshot MB':>14}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            seed(directory, size)
+            for mode, snapshot in (("sql", ""), ("rebuild", SNAPSHOT), ("mapped", SNAPSHOT)):
+                timing = cold_start(directory, snapshot)
+                path = os.path.join(directory, SNAPSHOT)
+                megabytes = os.path.getsize(path) / 1e6 if snapshot and os.path.exists(path) else 0.0
+                print(f"{timing['rows']:>10}{mode:>10}{timing['import']:>12.3f}"
+                      f"{timing['startup']:>12.3f}{megabytes:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Compare two benchmark suite results (see benchmarks/suite.py)
+
+Metrics ending in _per_second are better when higher; times (_ms, seconds)
+and sizes (_bytes) are better when lower. Changes worse than --threshold
+percent are marked as regressions; --fail makes them set the exit status.
+
+    python benchmarks/compare.py base.json head.json --threshold 10 --fail
+"""
+import argparse
+import json
+import sys
+
+
+def higher_is_better(metric: str) -> bool:
+    return metric.endswith("_per_second")
+
+
+def compare(base: dict, head: dict, threshold: float):
+    """(name, metric, base, head, change %, regressed) for metrics present in both"""
+    rows = []
+    for name, head_metrics in head["results"].items():
+        base_metrics = base["results"].get(name)
+        if base_metrics is None:
+            continue
+        for metric, head_value in head_metrics.items():
+            base_value = base_metrics.get(metric)
+            if not base_value:
+                continue
+            change = (head_value - base_value) / base_value * 100
+            worse = -change if higher_is_better(metric) else change
+            rows.append((name, metric, base_value, head_value, change, worse > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression")
+    parser.add_argument("--fail", action="store_true", help="exit with status 1 on any regression")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"base {base['meta']['commit']}  vs  head {head['meta']['commit']}")
+    print(f"{'benchmark':<48}{'metric':<26}{'base':>14}{'head':>14}{'change':>10}")
+    rows = compare(base, head, args.threshold)
+    for name, metric, base_value, head_value, change, regressed in rows:
+        marker = "  REGRESSION" if regressed else ""
+        print(f"{name:<48}{metric:<26}{base_value:>14}{head_value:>14}{change:>+9.1f}%{marker}")
+
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"{regressions} regression(s) beyond {args.threshold}%")
+    if args.fail and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
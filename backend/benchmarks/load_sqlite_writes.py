@@ -0,0 +1,100 @@
+"""
+Concurrent write throughput of the SQLite storage profiles
+
+Each worker thread repeatedly writes what one /recommend call writes (a
+Student and five Recommendation rows) in its own transaction, against a
+fresh temporary database per profile.
+
+    python benchmarks/load_sqlite_writes.py --threads 16 --writes 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from database import STORAGE_PROFILES, create_storage_engine  # noqa: E402
+from models import Base, Student, Recommendation  # noqa: E402
+
+
+def _write_one(Session, i: int):
+    db = Session()
+    try:
+        student = Student(name=f"Load {i}", cgpa=8.0, ielts=7.0, budget=30000,
+                          country="Canada", field="CS", career_goal="Engineer")
+        db.add(student)
+        db.flush()
+        db.add_all([
+            Recommendation(student_id=student.id, university_id=rank, roi_score=80.0,
+                           acceptance_probability=70.0, employability=85.0, visa_success=80.0,
+                           ai_confidence=75.0, risk_level="Low")
+            for rank in range(1, 6)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_profile(profile: str, threads: int, writes: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_storage_engine(f"sqlite:///{os.path.join(tmp, 'load.db')}", profile)
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def worker(offset: int):
+            for n in range(writes):
+                started = time.perf_counter()
+                try:
+                    _write_one(Session, offset * writes + n)
+                except Exception as e:
+                    with lock:
+                        errors.append(type(e).__name__)
+                    continue
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+
+        workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+        started = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        elapsed = time.perf_counter() - started
+        engine.dispose()
+
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000 if latencies else 0.0
+    return {
+        "profile": profile,
+        "transactions": len(latencies),
+        "errors": len(errors),
+        "tx_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(pick(0.50), 2),
+        "p99_ms": round(pick(0.99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--writes", type=int, default=200, help="transactions per thread")
+    parser.add_argument("--profiles", nargs="+", default=list(STORAGE_PROFILES))
+    args = parser.parse_args()
+
+    print(f"{'profile':<10}{'tx/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for profile in args.profiles:
+        result = run_profile(profile, args.threads, args.writes)
+        print(f"{result['profile']:<10}{result['tx_per_second']:>10}{result['p50_ms']:>10}"
+              f"{result['p99_ms']:>10}{result['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Recommender benchmark suite with machine-readable results
+
+Runs, for each synthetic catalog size:
+- scoring: per-profile latency and throughput of each scoring backend, and
+  cohort throughput of the batch path
+- memory: tracemalloc peak for building the catalog columns and for one request
+and, against the ASGI app in-process (fresh temporary database):
+- http: POST /recommend and GET /analytics latency percentiles under concurrency
+
+Results are written as JSON for benchmarks/compare.py:
+
+    python benchmarks/suite.py --sizes 1000 10000 100000 --out base.json
+    python benchmarks/suite.py --sizes 1000 10000 100000 1000000 --http-catalog 10000 --out head.json
+    python benchmarks/compare.py base.json head.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+
+from synthetic import synthetic_records, synthetic_students, synthetic_universities  # noqa: E402
+from engine import BATCH_SCORING_BACKENDS, DEFAULT_TOP_K, score_recommendations  # noqa: E402
+from scoring import UniversityColumns  # noqa: E402
+
+# The per-row Python backend is too slow to time on the largest catalogs
+PYTHON_BACKEND_MAX_ROWS = 100_000
+
+
+def _percentiles(samples_seconds: List[float]) -> Dict[str, float]:
+    samples = np.array(samples_seconds) * 1000
+    return {
+        "mean_ms": round(float(samples.mean()), 4),
+        "p50_ms": round(float(np.percentile(samples, 50)), 4),
+        "p90_ms": round(float(np.percentile(samples, 90)), 4),
+        "p99_ms": round(float(np.percentile(samples, 99)), 4),
+    }
+
+
+def bench_scoring(size: int, profiles: int, results: Dict[str, dict]):
+    records = synthetic_records(size)
+    students = [SimpleNamespace(**student) for student in synthetic_students(profiles, seed=size)]
+
+    started = time.perf_counter()
+    cols = UniversityColumns(records)
+    results[f"catalog/build/rows={size}"] = {"seconds": round(time.perf_counter() - started, 4)}
+
+    backends = ["numpy"] + (["python"] if size <= PYTHON_BACKEND_MAX_ROWS else [])
+    for backend in backends:
+        # The Python backend gets fewer profiles on large catalogs to bound run time
+        cohort = students if backend == "numpy" else students[:max(5, profiles * 1000 // size)]
+        samples = []
+        for student in cohort:
+            started = time.perf_counter()
+            score_recommendations(student, cols, DEFAULT_TOP_K, backend)
+            samples.append(time.perf_counter() - started)
+        results[f"scoring/{backend}/rows={size}"] = dict(
+            _percentiles(samples),
+            profiles_per_second=round(len(samples) / sum(samples), 2),
+        )
+
+    started = time.perf_counter()
+    BATCH_SCORING_BACKENDS["numpy"](students, cols, DEFAULT_TOP_K)
+    elapsed = time.perf_counter() - started
+    results[f"scoring/numpy_batch/rows={size}"] = {"profiles_per_second": round(len(students) / elapsed, 2)}
+
+    # Memory in a separate pass: tracemalloc slows allocation-heavy code down
+    del cols
+    tracemalloc.start()
+    cols = UniversityColumns(records)
+    _, build_peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    score_recommendations(students[0], cols, DEFAULT_TOP_K, "numpy")
+    _, request_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results[f"memory/rows={size}"] = {
+        "columns_build_peak_bytes": build_peak,
+        "request_peak_bytes": request_peak - baseline,
+    }
+
+
+async def _timed_requests(client, method: str, path: str, payloads: List, concurrency: int) -> List[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(payload):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(method, path, json=payload)
+            samples.append(time.perf_counter() - started)
+            response.raise_for_status()
+
+    await asyncio.gather(*(one(payload) for payload in payloads))
+    return samples
+
+
+async def bench_http(catalog_size: int, requests: int, concurrency: int, results: Dict[str, dict]):
+    import httpx
+
+    # database.DATABASE_URL is relative, so the app runs inside the temporary directory
+    from database import SessionLocal, init_db
+    from data import upsert_universities
+    import main
+
+    init_db()
+    db = SessionLocal()
+    try:
+        rows = synthetic_universities(catalog_size)
+        for row in rows:
+            row.pop("id")
+        upsert_universities(db, rows)
+    finally:
+        db.close()
+
+    await main.app.router.startup()
+    try:
+        async with httpx.AsyncClient(app=main.app, base_url="http://bench") as client:
+            students = synthetic_students(requests, seed=1)
+            await _timed_requests(client, "POST", "/recommend", students[:10], concurrency)
+
+            started = time.perf_counter()
+            samples = await _timed_requests(client, "POST", "/recommend", students, concurrency)
+            elapsed = time.perf_counter() - started
+            results[f"http/recommend/catalog={catalog_size}/concurrency={concurrency}"] = dict(
+                _percentiles(samples), requests_per_second=round(len(samples) / elapsed, 2)
+            )
+
+            started = time.perf_counter()
+            samples = await _timed_requests(client, "GET", "/analytics", [None] * requests, concurrency)
+            elapsed = time.perf_counter() - started
+            results[f"http/analytics/concurrency={concurrency}"] = dict(
+                _percentiles(samples), requests_per_second=round(len(samples) / elapsed, 2)
+            )
+    finally:
+        await main.app.router.shutdown()
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="catalog rows")
+    parser.add_argument("--profiles", type=int, default=200, help="students per scoring run")
+    parser.add_argument("--http-catalog", type=int, default=10000, help="catalog rows for the HTTP run (0 skips it)")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--out", default="benchmark-results.json")
+    args = parser.parse_args()
+    out = os.path.abspath(args.out)
+
+    results: Dict[str, dict] = {}
+    for size in args.sizes:
+        print(f"scoring: {size} rows")
+        bench_scoring(size, args.profiles, results)
+
+    if args.http_catalog:
+        print(f"http: {args.requests} requests, concurrency {args.concurrency}")
+        with tempfile.TemporaryDirectory() as directory:
+            cwd = os.getcwd()
+            os.chdir(directory)
+            try:
+                asyncio.run(bench_http(args.http_catalog, args.requests, args.concurrency, results))
+            finally:
+                os.chdir(cwd)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, metrics in results.items():
+        print(f"{name:<48}" + "  ".join(f"{metric}={value}" for metric, value in metrics.items()))
+    print(f"Wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Synthetic university catalogs and student cohorts sampled from STATIC_UNIVERSITIES
+"""
+import os
+import random
+import sys
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import UniversityRecord, RECORD_FIELDS  # noqa: E402
+from data import STATIC_UNIVERSITIES  # noqa: E402
+
+
+def _spread(key: str):
+    values = [u[key] for u in STATIC_UNIVERSITIES]
+    return min(values), max(values)
+
+
+def synthetic_university(i: int, rng: random.Random) -> dict:
+    """One university row, each numeric field drawn from the seed data's range"""
+    template = rng.choice(STATIC_UNIVERSITIES)
+    row = dict(template)
+    row["id"] = i + 1
+    row["name"] = f"{template['name']} #{i + 1}"
+    for key in ("avg_salary", "tuition"):
+        low, high = _spread(key)
+        row[key] = float(round(rng.uniform(low, high), -2))
+    for key in ("visa_rate", "acceptance_rate", "employment_rate", "risk_index"):
+        low, high = _spread(key)
+        row[key] = round(rng.uniform(low, high), 2)
+    row["ielts_requirement"] = rng.choice([6.0, 6.5, 7.0, 7.5])
+    row["cgpa_requirement"] = rng.choice([7.0, 7.5, 8.0, 8.5, 9.0])
+    row["ranking"] = rng.randint(1, 500)
+    row["scholarship_available"] = rng.random() < 0.7
+    return row
+
+
+def synthetic_universities(count: int, seed: int = 0) -> List[dict]:
+    """Catalog rows as dicts, ready for University(**row) or bulk inserts"""
+    rng = random.Random(seed)
+    return [synthetic_university(i, rng) for i in range(count)]
+
+
+def synthetic_records(count: int, seed: int = 0) -> List[UniversityRecord]:
+    """Catalog rows as the read-only records the in-memory catalog holds"""
+    return [
+        UniversityRecord(*(row[field] for field in RECORD_FIELDS))
+        for row in synthetic_universities(count, seed)
+    ]
+
+
+FIELDS = ["Computer Science", "Data Science", "Artificial Intelligence", "Machine Learning", "Software Engineering"]
+
+CAREER_GOALS = ["Software Engineer", "Data Scientist", "ML Engineer", "Researcher", "Product Manager"]
+
+
+def synthetic_students(count: int, seed: int = 0) -> List[dict]:
+    """StudentProfile payloads with budgets spanning the seed data's tuition range"""
+    rng = random.Random(seed)
+    countries = sorted({u["country"] for u in STATIC_UNIVERSITIES})
+    low, high = _spread("tuition")
+    return [
+        {
+            "name": f"Student {i + 1}",
+            "cgpa": round(rng.uniform(6.0, 10.0), 1),
+            "ielts": rng.choice([5.5, 6.0, 6.5, 7.0, 7.5, 8.0, 8.5]),
+            "budget": max(1000, int(round(rng.uniform(low, high * 1.2), -2))),
+            "country": rng.choice(countries),
+            "field": rng.choice(FIELDS),
+            "careerGoal": rng.choice(CAREER_GOALS),
+        }
+        for i in range(count)
+    ]
@@ -0,0 +1,113 @@
+"""
+Memoized recommendation results keyed by the normalized scoring inputs
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Iterable, Optional, Tuple
+
+
+def scoring_key(profile, k: int, strict: bool) -> Tuple:
+    """
+    Cache key for a student profile
+    Only the inputs that affect scoring are used; name and careerGoal are not.
+    Text is normalized exactly as scoring compares it (lowercased, not
+    stripped), so two profiles share a key only if they score the same.
+    """
+    return (
+        float(profile.cgpa),
+        float(profile.ielts),
+        int(profile.budget),
+        profile.country.lower(),
+        profile.field.lower(),
+        k,
+        strict,
+    )
+
+
+class RecommendationCache:
+    """
+    Thread-safe LRU cache with a per-entry TTL
+    Entries belong to one catalog version (an increasing int); a lookup with a
+    newer version drops everything cached for the old catalog, and results
+    scored against an older version are never stored.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, object]]" = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        if self._version is None or version > self._version:
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key: Hashable, version) -> Optional[object]:
+        """Cached value for key, or None on a miss"""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key) if version == self._version else None
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value, version):
+        """Store a value computed against the given catalog version"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._check_version(version)
+            if version != self._version:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+
+def combine_stats(stats: Iterable[dict]) -> dict:
+    """stats() of several workers' caches as one: counters and sizes summed"""
+    stats = list(stats)
+    hits = sum(s["hits"] for s in stats)
+    misses = sum(s["misses"] for s in stats)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "size": sum(s["size"] for s in stats),
+        "maxsize": sum(s["maxsize"] for s in stats),
+        "ttl": stats[0]["ttl"] if stats else None,
+    }
+
+
+recommendation_cache = RecommendationCache(
+    maxsize=int(os.getenv("EDUINTEL_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("EDUINTEL_CACHE_TTL", "300")),
+)
@@ -0,0 +1,380 @@
+"""
+In-memory university catalog shared by all requests in the process
+
+The catalog is kept as a binary snapshot file (see catalog_snapshot.py) that
+is memory-mapped read-only. Columns, the precomputed score arrays and the
+indexes are views into the mapping, so startup only maps the file and worker
+processes pointed at the same file (serve.py puts it in /dev/shm) share one
+copy. The snapshot records the generation of the universities table it was
+built from (catalog_meta, bumped in every writing transaction); a snapshot
+from another generation is stale and is rebuilt from SQL. A process that
+changes the table republishes the snapshot, and the others notice the
+replaced file on their next read and remap it.
+"""
+import os
+import threading
+import uuid
+from collections.abc import Sequence
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from catalog_index import RANGE_COLUMNS, CatalogIndex, PostingLists
+from catalog_snapshot import Snapshot, SnapshotError, StringTable, write_snapshot
+from models import CatalogMeta, University
+from scoring import FLOAT_COLUMNS, STATIC_COLUMNS, UniversityColumns
+
+try:
+    import fcntl
+except ImportError:  # Windows: publishes from different processes are not serialized
+    fcntl = None
+
+# Snapshot file the catalog is mapped from: EDUINTEL_SHARED_CATALOG (set by
+# serve.py for its workers), else EDUINTEL_CATALOG_SNAPSHOT. Set the latter to
+# an empty string to build the catalog on the heap of each process instead.
+SNAPSHOT_PATH = os.getenv("EDUINTEL_SHARED_CATALOG") or os.getenv("EDUINTEL_CATALOG_SNAPSHOT", "eduintel-catalog.bin")
+
+CATALOG_META_ID = 1
+
+RECORD_FIELDS = (
+    "id",
+    "name",
+    "country",
+    "program",
+    "avg_salary",
+    "tuition",
+    "visa_rate",
+    "acceptance_rate",
+    "employment_rate",
+    "risk_index",
+    "ielts_requirement",
+    "cgpa_requirement",
+    "ranking",
+    "scholarship_available",
+)
+
+
+class UniversityRecord:
+    """
+    Read-only copy of a University row, detached from any session
+    """
+    __slots__ = RECORD_FIELDS
+
+    def __init__(self, *values):
+        for field, value in zip(RECORD_FIELDS, values):
+            object.__setattr__(self, field, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UniversityRecord is read-only")
+
+    def __repr__(self) -> str:
+        return f"UniversityRecord(id={self.id}, name={self.name!r})"
+
+
+STRING_FIELDS = ("name", "country", "program")
+
+
+class SnapshotRows(Sequence):
+    """
+    Catalog rows read from a mapped snapshot
+    Records are built on access, so a process holds no per-row objects.
+    """
+
+    def __init__(self, snapshot: Snapshot):
+        self.ids = snapshot["id"]
+        self._names = snapshot.strings("name")
+        self._countries = snapshot.strings("country")
+        self._programs = snapshot.strings("program")
+        self._floats = [snapshot[column] for column in FLOAT_COLUMNS]
+        self._ranking = snapshot["ranking"]
+        self._scholarship = snapshot["scholarship_available"]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        # Field order matches RECORD_FIELDS
+        return UniversityRecord(
+            int(self.ids[i]),
+            self._names[i],
+            self._countries[i],
+            self._programs[i],
+            *(float(values[i]) for values in self._floats),
+            int(self._ranking[i]),
+            bool(self._scholarship[i]),
+        )
+
+    def country_of(self, university_id: int) -> Optional[str]:
+        # Rows are ordered by id
+        i = int(np.searchsorted(self.ids, university_id))
+        if i < len(self.ids) and self.ids[i] == university_id:
+            return self._countries[i]
+        return None
+
+
+def read_generation(db) -> Optional[Tuple[str, int]]:
+    """(token, generation) of the universities table, or None if it is not tracked yet"""
+    # A Core select, so a cached CatalogMeta in the session is never returned
+    row = db.execute(
+        select(CatalogMeta.token, CatalogMeta.generation).where(CatalogMeta.id == CATALOG_META_ID)
+    ).first()
+    return (row.token, row.generation) if row else None
+
+
+def ensure_generation(db) -> Tuple[str, int]:
+    """
+    (token, generation) of the universities table, creating the row if needed
+    A database from before catalog_meta existed gets a fresh random token, so
+    no snapshot built earlier can ever match it.
+    """
+    generation = read_generation(db)
+    if generation is None:
+        statement = sqlite_insert(CatalogMeta).values(id=CATALOG_META_ID, token=uuid.uuid4().hex, generation=0)
+        db.execute(statement.on_conflict_do_nothing(index_elements=["id"]))
+        db.commit()
+        generation = read_generation(db)
+    return generation
+
+
+def bump_generation(db):
+    """
+    Count a change to the universities table; call it in the writing transaction
+    The token is chosen when the row is created, so a replaced database never
+    matches a snapshot of the old one even at the same generation.
+    """
+    statement = sqlite_insert(CatalogMeta).values(id=CATALOG_META_ID, token=uuid.uuid4().hex, generation=1)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["id"],
+        set_={"generation": CatalogMeta.generation + 1, "updated_at": func.now()}
+    ))
+
+
+def snapshot_sections(cols: UniversityColumns, index: CatalogIndex) -> Dict[str, np.ndarray]:
+    """Rows, score columns and indexes of a catalog as snapshot sections"""
+    rows = cols.rows
+    strings = StringTable()
+    sections = {
+        "id": np.fromiter((u.id for u in rows), dtype="<i8", count=len(rows)),
+        "ranking": np.fromiter((u.ranking for u in rows), dtype="<i8", count=len(rows)),
+        "scholarship_available": np.fromiter((bool(u.scholarship_available) for u in rows),
+                                             dtype="|u1", count=len(rows)),
+    }
+    for field in STRING_FIELDS:
+        sections[field] = strings.refs(getattr(u, field) for u in rows)
+    for column in FLOAT_COLUMNS + STATIC_COLUMNS + ("country_code",):
+        sections[column] = getattr(cols, column)
+    # Lowercased country of each country code, in code order
+    sections["country_keys"] = strings.refs(sorted(cols.country_codes, key=cols.country_codes.get))
+    for name, postings in (("countries", index.countries), ("tokens", index.tokens)):
+        sections[f"{name}.keys"] = strings.refs(postings.keys)
+        sections[f"{name}.offsets"] = postings.offsets
+        sections[f"{name}.positions"] = postings.positions
+    for column in RANGE_COLUMNS:
+        sections[f"order.{column}"] = index.orders[column]
+        sections[f"sorted.{column}"] = index.sorted_values[column]
+    sections.update(strings.sections())
+    return sections
+
+
+def open_snapshot(snapshot: Snapshot) -> CatalogIndex:
+    """Columns and indexes over a mapped snapshot, without copying any section"""
+    country_codes = {country: code for code, country in enumerate(snapshot.strings("country_keys"))}
+    cols = UniversityColumns.from_arrays(SnapshotRows(snapshot), snapshot.sections, country_codes)
+    countries, tokens = (
+        PostingLists(snapshot.strings(f"{name}.keys"), snapshot[f"{name}.offsets"], snapshot[f"{name}.positions"])
+        for name in ("countries", "tokens")
+    )
+    return CatalogIndex.from_parts(
+        cols,
+        countries,
+        tokens,
+        {column: snapshot[f"order.{column}"] for column in RANGE_COLUMNS},
+        {column: snapshot[f"sorted.{column}"] for column in RANGE_COLUMNS},
+    )
+
+
+@contextmanager
+def _publish_lock(path: str):
+    """
+    Serialize rebuild-and-publish across processes
+    Each rebuild then reads the table after the previous publish, so the last
+    snapshot published always includes the last committed change.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class UniversityCatalog:
+    """
+    Process-wide, read-mostly copy of the universities table
+    Built once at startup and rebuilt lazily after invalidate() is called by
+    code that writes to the universities table.
+    With a snapshot_path the catalog is published to and mapped from that file.
+    """
+
+    def __init__(self, snapshot_path: str = SNAPSHOT_PATH):
+        self.snapshot_path = snapshot_path
+        self._lock = threading.Lock()
+        self._columns: Optional[UniversityColumns] = None
+        self._index: Optional[CatalogIndex] = None
+        self._countries_by_id = {}
+        self._snapshot: Optional[Snapshot] = None
+        self._stale = True
+        self.version = 0
+
+    def load(self, db) -> UniversityColumns:
+        """
+        Read the universities table and replace the catalog contents
+        A snapshot built from the table's current generation is mapped instead.
+        """
+        with self._lock:
+            return self._load(db)
+
+    def publish(self, db) -> UniversityColumns:
+        """Rebuild from the universities table (and write the snapshot), even if it is current"""
+        with self._lock:
+            return self._load(db, reuse=False)
+
+    def _read(self, db) -> UniversityColumns:
+        # Select plain columns so no ORM objects are hydrated
+        columns = [getattr(University, field) for field in RECORD_FIELDS]
+        rows = db.query(*columns).order_by(University.id).all()
+        return UniversityColumns([UniversityRecord(*row) for row in rows])
+
+    def _load(self, db, reuse: bool = True) -> UniversityColumns:
+        if self.snapshot_path:
+            try:
+                return self._load_snapshot(db, reuse)
+            except OSError as e:
+                print(f"Catalog snapshot unavailable ({e}); keeping the catalog in memory")
+
+        self._columns = self._read(db)
+        self._index = CatalogIndex(self._columns)
+        self._countries_by_id = {record.id: record.country for record in self._columns.rows}
+        self._snapshot = None
+        self._stale = False
+        return self._columns
+
+    def _load_snapshot(self, db, reuse: bool) -> UniversityColumns:
+        with _publish_lock(self.snapshot_path):
+            # Read before the rows: a write landing in between only makes the snapshot look stale
+            token, generation = ensure_generation(db)
+            # Workers starting together wait here; all but the first find a current snapshot
+            if reuse and self._attach((token, generation)):
+                return self._columns
+            columns = self._read(db)
+            write_snapshot(self.snapshot_path, len(columns), snapshot_sections(columns, CatalogIndex(columns)),
+                           token=token, generation=generation)
+            if self._attach():
+                return self._columns
+        raise SnapshotError(f"{self.snapshot_path}: published snapshot could not be mapped")
+
+    def _attach(self, expected: Optional[Tuple[str, int]] = None) -> bool:
+        """
+        Map the snapshot at snapshot_path
+        False if there is no readable one, or if `expected` (token, generation)
+        is given and the snapshot was built from another generation.
+        """
+        try:
+            snapshot = Snapshot(self.snapshot_path)
+        except FileNotFoundError:
+            return False
+        except SnapshotError as e:
+            print(f"Ignoring catalog snapshot: {e}")
+            return False
+        if expected is not None and (snapshot.token, snapshot.generation) != tuple(expected):
+            reason = ("built from another database" if snapshot.token != expected[0]
+                      else f"generation {snapshot.generation}, table at {expected[1]}")
+            print(f"Catalog snapshot is stale ({reason}); rebuilding from the database")
+            return False
+        self._index = open_snapshot(snapshot)
+        self._columns = self._index.cols
+        self._snapshot = snapshot
+        self._stale = False
+        # Results cached against the previous contents must not be reused
+        self.version += 1
+        return True
+
+    def _republished(self) -> bool:
+        """Whether another process published a snapshot since ours was mapped"""
+        if self._snapshot is None:
+            return False
+        try:
+            stat = os.stat(self.snapshot_path)
+        except OSError:
+            return False
+        return (stat.st_dev, stat.st_ino) != self._snapshot.file_id
+
+    def invalidate(self, db=None):
+        """
+        Mark the catalog stale after the universities table changed
+        With a snapshot, passing the writer's session republishes right away so
+        other processes pick the change up without waiting for this one.
+        """
+        with self._lock:
+            self._stale = True
+            self.version += 1
+            if self.snapshot_path and db is not None:
+                try:
+                    self._load(db, reuse=False)
+                except Exception as e:
+                    # Still stale, so the next read retries the rebuild
+                    print(f"Error publishing catalog snapshot: {e}")
+
+    def get(self, db) -> UniversityColumns:
+        """Current catalog columns, reloading from the database only if stale"""
+        columns = self._columns
+        if columns is not None and not self._stale and not self._republished():
+            return columns
+        with self._lock:
+            if self._columns is None:
+                return self._load(db)
+            if self._stale:
+                return self._load(db, reuse=False)
+            if self._republished():
+                self._attach()
+            return self._columns
+
+    def current_version(self) -> int:
+        """
+        Catalog version to key cached results on
+        Maps a snapshot another process published first, so a cache hit never
+        serves results scored against the contents it replaced.
+        """
+        if self._republished():
+            with self._lock:
+                if self._republished():
+                    self._attach()
+        return self.version
+
+    def get_index(self, db) -> CatalogIndex:
+        """Indexes over the current catalog columns (see catalog_index.py)"""
+        columns = self.get(db)
+        index = self._index
+        # A reload may land between the two reads; never pair mismatched snapshots
+        return index if index is not None and index.cols is columns else CatalogIndex(columns)
+
+    def country_of(self, university_id: int) -> Optional[str]:
+        """Country of a university in the last loaded catalog"""
+        if isinstance(self.records, SnapshotRows):
+            return self.records.country_of(university_id)
+        return self._countries_by_id.get(university_id)
+
+    @property
+    def records(self) -> List[UniversityRecord]:
+        return self._columns.rows if self._columns is not None else []
+
+
+catalog = UniversityCatalog()
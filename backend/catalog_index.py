@@ -0,0 +1,149 @@
+"""
+In-process indexes over the university catalog for candidate pre-filtering
+"""
+import re
+from bisect import bisect_left
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from scoring import UniversityColumns
+
+RANGE_COLUMNS = ("ielts_requirement", "cgpa_requirement", "tuition")
+
+_EMPTY = np.empty(0, dtype=np.intp)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens of a program or field name"""
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+class PostingLists:
+    """
+    Read-only mapping from sorted keys to position arrays, in CSR form
+    positions[offsets[i]:offsets[i + 1]] are the positions for keys[i]. Keys
+    may be any sorted sequence, e.g. strings decoded from a mapped snapshot.
+    """
+
+    def __init__(self, keys: Sequence[str], offsets: np.ndarray, positions: np.ndarray):
+        self.keys = keys
+        self.offsets = offsets
+        self.positions = positions
+
+    @classmethod
+    def from_lists(cls, lists: Dict[str, List[int]]) -> "PostingLists":
+        keys = sorted(lists)
+        offsets = np.zeros(len(keys) + 1, dtype=np.intp)
+        np.cumsum([len(lists[key]) for key in keys], out=offsets[1:])
+        positions = np.fromiter((i for key in keys for i in lists[key]), dtype=np.intp, count=offsets[-1])
+        return cls(keys, offsets, positions)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def at(self, i: int) -> np.ndarray:
+        return self.positions[self.offsets[i]:self.offsets[i + 1]]
+
+    def get(self, key: str, default=None):
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.at(i)
+        return default
+
+
+class CatalogIndex:
+    """
+    Lookup structures over a UniversityColumns snapshot
+    - hash buckets by lowercased country
+    - token index over program names, with prefix lookup
+    - sorted arrays for IELTS, CGPA and tuition range queries
+    Every lookup returns catalog positions in ascending order, so scoring a
+    filtered subset keeps the same tie order as scoring the full catalog.
+    """
+
+    def __init__(self, cols: UniversityColumns):
+        self.cols = cols
+
+        countries: Dict[str, List[int]] = {}
+        tokens: Dict[str, List[int]] = {}
+        for i, university in enumerate(cols.rows):
+            countries.setdefault(university.country.lower(), []).append(i)
+            for token in set(tokenize(university.program)):
+                tokens.setdefault(token, []).append(i)
+        self.countries = PostingLists.from_lists(countries)
+        self.tokens = PostingLists.from_lists(tokens)
+
+        self.orders = {}
+        self.sorted_values = {}
+        for column in RANGE_COLUMNS:
+            values = getattr(cols, column)
+            order = np.argsort(values, kind="stable")
+            self.orders[column] = order
+            self.sorted_values[column] = values[order]
+
+    @classmethod
+    def from_parts(cls, cols: UniversityColumns, countries: PostingLists, tokens: PostingLists,
+                   orders: Dict[str, np.ndarray], sorted_values: Dict[str, np.ndarray]) -> "CatalogIndex":
+        """An index over prebuilt structures (e.g. a mapped snapshot); nothing is recomputed"""
+        index = cls.__new__(cls)
+        index.cols = cols
+        index.countries = countries
+        index.tokens = tokens
+        index.orders = orders
+        index.sorted_values = sorted_values
+        return index
+
+    def __len__(self) -> int:
+        return len(self.cols)
+
+    def by_country(self, country: str) -> np.ndarray:
+        """Positions of universities in a country (case-insensitive)"""
+        return self.countries.get(country.lower(), _EMPTY)
+
+    def by_program(self, text: str) -> np.ndarray:
+        """
+        Positions of programs matching every token of `text` as a word prefix
+        e.g. "Comp Sci" matches "MSc Computer Science".
+        """
+        result = None
+        for token in tokenize(text):
+            matches = []
+            for i in range(bisect_left(self.tokens.keys, token), len(self.tokens)):
+                if not self.tokens.keys[i].startswith(token):
+                    break
+                matches.append(self.tokens.at(i))
+            positions = np.unique(np.concatenate(matches)) if matches else _EMPTY
+            result = positions if result is None else np.intersect1d(result, positions, assume_unique=True)
+        return np.arange(len(self)) if result is None else result
+
+    def in_range(self, column: str, low: float = -np.inf, high: float = np.inf) -> np.ndarray:
+        """Positions where low <= column <= high"""
+        values = self.sorted_values[column]
+        start = np.searchsorted(values, low, side="left")
+        stop = np.searchsorted(values, high, side="right")
+        return np.sort(self.orders[column][start:stop])
+
+    def eligible(self, student) -> np.ndarray:
+        """
+        Positions of programs a student meets every requirement for:
+        IELTS and CGPA at or above the requirement, tuition within budget
+        """
+        result = self.in_range("ielts_requirement", high=student.ielts)
+        for column, limit in (("cgpa_requirement", student.cgpa), ("tuition", student.budget)):
+            if not len(result):
+                break
+            result = np.intersect1d(result, self.in_range(column, high=limit), assume_unique=True)
+        return result
+
+    def strict_candidates(self, student) -> np.ndarray:
+        """
+        Candidates for strict eligibility mode: eligible programs, narrowed to
+        the student's field when any eligible program matches it
+        """
+        candidates = self.eligible(student)
+        if len(candidates) and student.field:
+            in_field = np.intersect1d(candidates, self.by_program(student.field), assume_unique=True)
+            if len(in_field):
+                candidates = in_field
+        return candidates
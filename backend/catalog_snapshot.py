@@ -0,0 +1,152 @@
+"""
+Binary catalog snapshot: fixed-width columns plus a string table in one file
+
+The file is memory-mapped read-only and every column is a NumPy view into the
+mapping, so any number of processes mapping the same file share one copy of
+the pages. Layout (little-endian):
+
+    header    magic, format version, section count, row count, and the
+              token and generation of the universities table it was built from
+    sections  one entry per section: name, dtype, byte offset, item count
+    data      each section's array, 64-byte aligned
+
+Strings (names, countries, programs, index tokens) are stored once in a
+string table ("strings.offsets" and "strings.data") and referenced by int32
+position. A snapshot is published by writing a temporary file next to the
+target and os.replace()-ing it into place, so readers see either the old or
+the new file, never a partial one.
+"""
+import mmap
+import os
+import struct
+from collections.abc import Sequence
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+MAGIC = b"EDUCATLG"
+# Bumped on any layout change; files of another version are rebuilt, not read
+FORMAT_VERSION = 2
+
+HEADER = struct.Struct("<8sIIQQ32s")
+SECTION = struct.Struct("<32s8sQQ")
+ALIGNMENT = 64
+
+
+class SnapshotError(Exception):
+    """The file is not a readable snapshot of this format version"""
+
+
+class StringTable:
+    """Interns strings while a snapshot is written; refs are int32 positions"""
+
+    def __init__(self):
+        self._refs: Dict[str, int] = {}
+
+    def ref(self, value: str) -> int:
+        ref = self._refs.get(value)
+        if ref is None:
+            ref = self._refs[value] = len(self._refs)
+        return ref
+
+    def refs(self, values: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self.ref(value) for value in values), dtype="<i4")
+
+    def sections(self) -> Dict[str, np.ndarray]:
+        encoded = [value.encode() for value in self._refs]
+        offsets = np.zeros(len(encoded) + 1, dtype="<i8")
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return {
+            "strings.offsets": offsets,
+            "strings.data": np.frombuffer(b"".join(encoded), dtype="|u1"),
+        }
+
+
+class StringColumn(Sequence):
+    """Strings of a ref column, decoded from the mapped string table on access"""
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray, refs: np.ndarray):
+        self._offsets = offsets
+        self._data = data
+        self._refs = refs
+
+    def __len__(self) -> int:
+        return len(self._refs)
+
+    def __getitem__(self, i: int) -> str:
+        ref = self._refs[i]
+        return self._data[self._offsets[ref]:self._offsets[ref + 1]].tobytes().decode()
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_snapshot(path: str, row_count: int, arrays: Dict[str, np.ndarray],
+                   token: str = "", generation: int = 0):
+    """Write sections to path atomically (temporary file, then os.replace)"""
+    sections = []
+    offset = _align(HEADER.size + SECTION.size * len(arrays))
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+        sections.append((name, array, offset))
+        offset = _align(offset + array.nbytes)
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(sections), row_count, generation, token.encode()))
+            for name, array, start in sections:
+                f.write(SECTION.pack(name.encode(), array.dtype.str.encode(), start, array.size))
+            for name, array, start in sections:
+                f.seek(start)
+                f.write(memoryview(array).cast("B"))
+            # Covers trailing empty sections too
+            f.truncate(offset)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+class Snapshot:
+    """A mapped snapshot file; sections are read-only NumPy views"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size < HEADER.size:
+                raise SnapshotError(f"{path}: truncated header")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Identifies this file; a publish replaces the inode at path
+        self.file_id: Tuple[int, int] = (stat.st_dev, stat.st_ino)
+
+        magic, version, section_count, self.row_count, self.generation, token = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path}: not a catalog snapshot")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"{path}: format version {version}, expected {FORMAT_VERSION}")
+        self.token = token.rstrip(b"\0").decode()
+        if HEADER.size + section_count * SECTION.size > len(self._mmap):
+            raise SnapshotError(f"{path}: truncated section table")
+
+        self.sections: Dict[str, np.ndarray] = {}
+        for i in range(section_count):
+            name, dtype, offset, count = SECTION.unpack_from(self._mmap, HEADER.size + i * SECTION.size)
+            dtype = np.dtype(dtype.rstrip(b"\0").decode())
+            if offset + count * dtype.itemsize > len(self._mmap):
+                raise SnapshotError(f"{path}: section runs past the end of the file")
+            self.sections[name.rstrip(b"\0").decode()] = np.frombuffer(
+                self._mmap, dtype=dtype, count=count, offset=offset
+            )
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.sections[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.sections
+
+    def strings(self, refs_section: str) -> StringColumn:
+        """A ref column decoded through the string table"""
+        return StringColumn(self["strings.offsets"], self["strings.data"], self[refs_section])
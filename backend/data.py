@@ -1,12 +1,22 @@
 """
 University data module with scraper functionality
+
+Bulk-load a catalog file (CSV with a header row, or JSONL), upserting on name:
+    python data.py ingest universities.csv
 """
+import csv
+import json
+import sys
 import requests
 from bs4 import BeautifulSoup
-from typing import List, Dict
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
 import time
 import random
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from models import University
+from catalog import bump_generation, catalog
 
 # Static university dataset (fallback and initial data)
 STATIC_UNIVERSITIES = [
@@ -279,24 +289,151 @@ def get_university_by_name(name: str, db) -> University:
     """Get university from database by name, or return None"""
     return db.query(University).filter(University.name == name).first()
 
+# Rows per INSERT ... ON CONFLICT executemany (and per commit) when bulk loading
+INGEST_CHUNK_SIZE = 5000
+
+UNIVERSITY_FIELDS = tuple(STATIC_UNIVERSITIES[0].keys())
+
+def _parse_bool(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "yes", "1")
+    return bool(value)
+
+_FIELD_TYPES = {
+    field: _parse_bool if field == "scholarship_available" else University.__table__.columns[field].type.python_type
+    for field in UNIVERSITY_FIELDS
+}
+
+def normalize_university(row: Dict) -> Dict:
+    """
+    University row with only known fields, converted to column types
+    Raises ValueError for missing or malformed required fields.
+    """
+    normalized = {}
+    for field, convert in _FIELD_TYPES.items():
+        value = row.get(field)
+        if value is None or value == "":
+            if field == "scholarship_available":
+                normalized[field] = False
+                continue
+            raise ValueError(f"missing {field}")
+        normalized[field] = convert(float(value)) if convert is int and isinstance(value, str) else convert(value)
+    return normalized
+
+def _chunks(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+def upsert_universities(db, rows: Iterable[Dict], update: bool = True,
+                        chunk_size: int = INGEST_CHUNK_SIZE, update_fields: Optional[Iterable[str]] = None) -> int:
+    """
+    Bulk insert universities with INSERT ... ON CONFLICT(name)
+    Existing names are updated (update=True) or left untouched (update=False);
+    update_fields limits an update to those columns. Rows are sent chunk_size
+    at a time, one commit per chunk. Returns the number of rows inserted or
+    updated and invalidates the catalog if any were.
+    """
+    update_fields = set(update_fields) if update_fields is not None else set(UNIVERSITY_FIELDS)
+    statement = sqlite_insert(University)
+    if update:
+        statement = statement.on_conflict_do_update(
+            index_elements=["name"],
+            set_=dict(
+                {
+                    field: getattr(statement.excluded, field)
+                    for field in UNIVERSITY_FIELDS if field != "name" and field in update_fields
+                },
+                updated_at=func.now()
+            )
+        )
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=["name"])
+
+    written = 0
+    for chunk in _chunks(rows, chunk_size):
+        # Core execution on the session's connection: ORM bulk mode would not report rowcount
+        count = db.connection().execute(statement, chunk).rowcount
+        if count:
+            # Same transaction as the rows, so catalog snapshots can tell they are stale
+            bump_generation(db)
+        written += count
+        db.commit()
+    if written:
+        catalog.invalidate(db)
+    return written
+
+def read_catalog_file(path: str) -> Iterator[Dict]:
+    """Stream raw rows from a .csv (header row) or .jsonl/.ndjson catalog file"""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def ingest_catalog_file(db, path: str, update: bool = True, chunk_size: int = INGEST_CHUNK_SIZE) -> Dict:
+    """
+    Normalize and upsert every row of a catalog file, streaming in chunks
+    Malformed rows are skipped and counted. Returns row counts and rows/sec.
+    """
+    counts = {"rows": 0, "skipped": 0}
+
+    def valid_rows():
+        for line_number, row in enumerate(read_catalog_file(path), 1):
+            counts["rows"] += 1
+            try:
+                yield normalize_university(row)
+            except (TypeError, ValueError) as e:
+                counts["skipped"] += 1
+                print(f"Skipping row {line_number}: {e}")
+
+    started = time.perf_counter()
+    written = upsert_universities(db, valid_rows(), update=update, chunk_size=chunk_size)
+    seconds = time.perf_counter() - started
+    return {
+        "rows": counts["rows"],
+        "written": written,
+        "skipped": counts["skipped"],
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(counts["rows"] / seconds, 1) if seconds > 0 else 0.0,
+    }
+
 def initialize_universities(db):
-    """Initialize database with static university data"""
-    for uni_data in STATIC_UNIVERSITIES:
-        existing = get_university_by_name(uni_data["name"], db)
-        if not existing:
-            university = University(**uni_data)
-            db.add(university)
-    db.commit()
+    """Initialize database with static university data (existing names are left as they are)"""
+    upsert_universities(db, STATIC_UNIVERSITIES, update=False)
 
 def get_all_universities(db) -> List[University]:
     """Get all universities from database"""
     return db.query(University).all()
 
 def search_universities_by_country(country: str, db) -> List[University]:
-    """Search universities by country"""
-    return db.query(University).filter(University.country == country).all()
+    """Search universities by country (case-insensitive, served from the catalog index)"""
+    index = catalog.get_index(db)
+    return [index.cols.rows[i] for i in index.by_country(country)]
 
 def search_universities_by_field(field: str, db) -> List[University]:
-    """Search universities by program field"""
-    return db.query(University).filter(University.program.ilike(f"%{field}%")).all()
+    """Search universities by program field (word-prefix match, served from the catalog index)"""
+    index = catalog.get_index(db)
+    return [index.cols.rows[i] for i in index.by_program(field)]
+
 
+if __name__ == "__main__":
+    from database import SessionLocal, init_db
+
+    if len(sys.argv) != 3 or sys.argv[1] != "ingest":
+        print("Usage: python data.py ingest <catalog.csv|catalog.jsonl>")
+        sys.exit(1)
+
+    init_db()
+    db = SessionLocal()
+    try:
+        result = ingest_catalog_file(db, sys.argv[2])
+        print(f"Ingested {result['rows']} rows ({result['written']} written, {result['skipped']} skipped) "
+              f"in {result['seconds']}s - {result['rows_per_second']} rows/sec")
+    finally:
+        db.close()
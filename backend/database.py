@@ -1,16 +1,87 @@
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from models import Base
 
 # SQLite database path
 DATABASE_URL = "sqlite:///./eduintel.db"
 
+# Same database through the aiosqlite driver, for async request handlers
+ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+# Storage profiles: SQLite pragmas applied to every new connection, plus pool settings
+STORAGE_PROFILES = {
+    # SQLite and SQLAlchemy defaults (rollback journal, full fsync per commit)
+    "default": {
+        "pragmas": {},
+        "pool": {},
+    },
+    # WAL lets readers run alongside the writer, and synchronous=NORMAL only
+    # fsyncs at checkpoints; busy_timeout makes writers wait instead of failing
+    "tuned": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "mmap_size": 256 * 1024 * 1024,
+            "cache_size": -64 * 1024,  # negative means KiB, so 64 MiB
+            "busy_timeout": 5000,
+            "temp_store": "MEMORY",
+        },
+        # SQLite has a single writer, so a small pool without overflow queues
+        # requests in-process instead of piling them up in busy_timeout retries
+        "pool": {
+            "pool_size": 5,
+            "max_overflow": 0,
+            "pool_timeout": 30,
+        },
+    },
+}
+
+STORAGE_PROFILE = os.getenv("EDUINTEL_STORAGE_PROFILE", "tuned")
+
+def _apply_pragmas(sync_engine, pragmas: dict):
+    """Run the profile's PRAGMA statements on each new DBAPI connection"""
+    if not pragmas:
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def create_storage_engine(url: str = DATABASE_URL, profile: str = STORAGE_PROFILE):
+    """Create a sync engine configured with a storage profile"""
+    settings = STORAGE_PROFILES[profile]
+    pool = dict(settings["pool"], poolclass=QueuePool) if settings["pool"] else {}
+    sqlite_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        echo=False,
+        **pool
+    )
+    _apply_pragmas(sqlite_engine, settings["pragmas"])
+    return sqlite_engine
+
+def create_async_storage_engine(url: str = ASYNC_DATABASE_URL, profile: str = STORAGE_PROFILE):
+    """Create an async (aiosqlite) engine configured with a storage profile"""
+    settings = STORAGE_PROFILES[profile]
+    # aiosqlite defaults to NullPool (a new connection per checkout), so pick the pool explicitly
+    pool = dict(settings["pool"], poolclass=AsyncAdaptedQueuePool) if settings["pool"] else {}
+    sqlite_engine = create_async_engine(
+        url,
+        echo=False,
+        **pool
+    )
+    _apply_pragmas(sqlite_engine.sync_engine, settings["pragmas"])
+    return sqlite_engine
+
 # Create engine
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    echo=False
-)
+engine = create_storage_engine()
 
 # Create session factory
 SessionLocal = sessionmaker(
@@ -19,6 +90,16 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+# Async engine and session factory
+async_engine = create_async_storage_engine()
+
+# Objects stay usable after commit, so ids can be read without a refresh query
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
@@ -30,3 +111,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    """Dependency for getting an async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,8 +1,16 @@
 """
 Recommendation Engine - AI-powered university matching algorithm
 """
-from typing import List, Tuple
+import heapq
+import os
+from itertools import count
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+from analytics import record_analytics
+from metrics import span
 from models import University, Student, Recommendation
+from scoring import RISK_LEVELS, StudentColumns, UniversityColumns, score_universities, top_k_indices
 from sqlalchemy.orm import Session
 
 def calculate_roi_score(university: University) -> float:
@@ -105,51 +113,145 @@ def calculate_ai_confidence(roi: float, match: float, acceptance: float) -> floa
     confidence = (roi * 0.3 + match * 100 * 0.3 + acceptance * 0.4)
     return round(min(100.0, confidence), 2)
 
-def generate_recommendations(student: Student, universities: List[University], db: Session) -> List[dict]:
+def _score_python(student: Student, universities: Union[List[University], UniversityColumns],
+                  k: int) -> List[dict]:
     """
-    Generate top 5 university recommendations for a student
+    Score universities one row at a time with the functions above
     """
-    scored_universities = []
+    if isinstance(universities, UniversityColumns):
+        universities = universities.rows
     
-    for university in universities:
-        # Calculate all metrics
-        roi = calculate_roi_score(university)
-        match = calculate_match_score(student, university)
-        acceptance = calculate_acceptance_probability(student, university)
-        employability = university.employment_rate * 100
-        visa_success = university.visa_rate * 100
-        risk_level = calculate_risk_level(university, student)
-        ai_confidence = calculate_ai_confidence(roi, match, acceptance)
-        
-        # Final recommendation score
-        final_score = (
-            0.4 * (roi / 100.0) +
-            0.3 * (acceptance / 100.0) +
-            0.2 * (employability / 100.0) +
-            0.1 * (visa_success / 100.0)
-        )
-        
-        scored_universities.append({
-            "university": university,
-            "roi": roi,
-            "match": match,
-            "acceptance": acceptance,
-            "employability": employability,
-            "visa_success": visa_success,
-            "risk_level": risk_level,
-            "ai_confidence": ai_confidence,
-            "final_score": final_score
-        })
-    
-    # Sort by final score and get top 5
-    scored_universities.sort(key=lambda x: x["final_score"], reverse=True)
-    top_5 = scored_universities[:5]
+    def scored_universities():
+        for university in universities:
+            # Calculate all metrics
+            roi = calculate_roi_score(university)
+            match = calculate_match_score(student, university)
+            acceptance = calculate_acceptance_probability(student, university)
+            employability = university.employment_rate * 100
+            visa_success = university.visa_rate * 100
+            risk_level = calculate_risk_level(university, student)
+            ai_confidence = calculate_ai_confidence(roi, match, acceptance)
+            
+            # Final recommendation score
+            final_score = (
+                0.4 * (roi / 100.0) +
+                0.3 * (acceptance / 100.0) +
+                0.2 * (employability / 100.0) +
+                0.1 * (visa_success / 100.0)
+            )
+            
+            yield {
+                "university": university,
+                "roi": roi,
+                "match": match,
+                "acceptance": acceptance,
+                "employability": employability,
+                "visa_success": visa_success,
+                "risk_level": risk_level,
+                "ai_confidence": ai_confidence,
+                "final_score": final_score
+            }
     
-    # Format response
+    # Keep only the best k while streaming; ties go to the earlier university
+    # (scoring and selection are interleaved, so they are timed as one stage)
+    order = count()
+    with span("score"):
+        best = heapq.nsmallest(
+            k,
+            ((-item["final_score"], next(order), item) for item in scored_universities())
+        )
+    return [item for _, _, item in best]
+
+def _top_items(cols: UniversityColumns, scores: dict, top: np.ndarray, row: Optional[int] = None) -> List[dict]:
+    """
+    Turn the selected columns of a score matrix back into per-university dicts
+    """
+    # Student-independent metrics are 1-D even when scoring a cohort
+    values = {
+        key: (value[row] if row is not None and value.ndim == 2 else value)
+        for key, value in scores.items()
+    }
+    return [
+        {
+            "university": cols.rows[i],
+            "roi": float(values["roi"][i]),
+            "match": float(values["match"][i]),
+            "acceptance": float(values["acceptance"][i]),
+            "employability": float(values["employability"][i]),
+            "visa_success": float(values["visa_success"][i]),
+            "risk_level": RISK_LEVELS[values["risk_code"][i]],
+            "ai_confidence": float(values["ai_confidence"][i]),
+            "final_score": float(values["final_score"][i])
+        }
+        for i in top
+    ]
+
+def _as_columns(universities: Union[List[University], UniversityColumns]) -> UniversityColumns:
+    return universities if isinstance(universities, UniversityColumns) else UniversityColumns(universities)
+
+def _score_numpy(student: Student, universities: Union[List[University], UniversityColumns],
+                 k: int) -> List[dict]:
+    """
+    Score all universities in one vectorized pass (see scoring.py)
+    """
+    cols = _as_columns(universities)
+    with span("score"):
+        scores = score_universities(student, cols)
+    with span("select_top_k"):
+        return _top_items(cols, scores, top_k_indices(scores["final_score"], k))
+
+# Upper bound on students x universities cells scored at once in a batch
+BATCH_MATRIX_CELLS = 1_000_000
+
+def _score_numpy_batch(students: List[Student], universities: Union[List[University], UniversityColumns],
+                       k: int) -> List[List[dict]]:
+    """
+    Score a cohort as a students x universities matrix, in row chunks
+    """
+    cols = _as_columns(universities)
+    chunk_size = max(1, BATCH_MATRIX_CELLS // max(1, len(cols)))
+    results = []
+    for start in range(0, len(students), chunk_size):
+        scores = score_universities(StudentColumns(students[start:start + chunk_size]), cols)
+        for row in range(scores["final_score"].shape[0]):
+            top = top_k_indices(scores["final_score"][row], k)
+            results.append(_top_items(cols, scores, top, row))
+    return results
+
+def _score_python_batch(students: List[Student], universities: Union[List[University], UniversityColumns],
+                        k: int) -> List[List[dict]]:
+    return [_score_python(student, universities, k) for student in students]
+
+SCORING_BACKENDS = {
+    "python": _score_python,
+    "numpy": _score_numpy,
+}
+
+BATCH_SCORING_BACKENDS = {
+    "python": _score_python_batch,
+    "numpy": _score_numpy_batch,
+}
+
+# Scoring backend used when none is passed explicitly
+DEFAULT_BACKEND = os.getenv("EDUINTEL_SCORING_BACKEND", "numpy")
+
+# Number of recommendations returned by default
+DEFAULT_TOP_K = 5
+
+def _resolve_backend(backend: Optional[str]) -> str:
+    backend = backend or DEFAULT_BACKEND
+    if backend not in SCORING_BACKENDS:
+        raise ValueError(f"Unknown scoring backend: {backend}")
+    return backend
+
+def format_recommendations(top_k: List[dict]) -> List[dict]:
+    """
+    Build the API response dicts for scored universities, best first
+    """
     recommendations = []
-    for idx, item in enumerate(top_5, start=1):
+    for idx, item in enumerate(top_k, start=1):
         uni = item["university"]
-        recommendation = {
+        recommendations.append({
             "id": idx,
             "university": uni.name,
             "country": uni.country,
@@ -163,22 +265,73 @@ def generate_recommendations(student: Student, universities: List[University], d
             "tuitionFee": uni.tuition,
             "scholarshipAvailable": uni.scholarship_available,
             "ranking": uni.ranking
+        })
+    return recommendations
+
+def recommendation_rows(student_id: int, top_k: List[dict]) -> List[dict]:
+    """
+    Column values of the Recommendation rows saved for scored universities
+    """
+    return [
+        {
+            "student_id": student_id,
+            "university_id": item["university"].id,
+            "roi_score": item["roi"],
+            "acceptance_probability": item["acceptance"],
+            "employability": item["employability"],
+            "visa_success": item["visa_success"],
+            "ai_confidence": item["ai_confidence"],
+            "risk_level": item["risk_level"]
         }
-        recommendations.append(recommendation)
-        
-        # Save to database
-        db_recommendation = Recommendation(
-            student_id=student.id,
-            university_id=uni.id,
-            roi_score=item["roi"],
-            acceptance_probability=item["acceptance"],
-            employability=item["employability"],
-            visa_success=item["visa_success"],
-            ai_confidence=item["ai_confidence"],
-            risk_level=item["risk_level"]
-        )
-        db.add(db_recommendation)
+        for item in top_k
+    ]
+
+def score_recommendations(student: Student, universities: Union[List[University], UniversityColumns],
+                          k: int = DEFAULT_TOP_K, backend: Optional[str] = None) -> List[dict]:
+    """
+    Score universities for a student and return the top k, best first
+    """
+    return SCORING_BACKENDS[_resolve_backend(backend)](student, universities, k)
+
+def save_recommendations(student: Student, top_k: List[dict], db: Session):
+    """
+    Save the Recommendation rows for a student's scored universities
+    The student is counted in the analytics totals in the same transaction.
+    """
+    rows = recommendation_rows(student.id, top_k)
+    for row in rows:
+        db.add(Recommendation(**row))
+    record_analytics(db, 1, rows)
     
     db.commit()
-    return recommendations
 
+def generate_recommendations(student: Student, universities: Union[List[University], UniversityColumns], db: Session,
+                             k: int = DEFAULT_TOP_K, backend: Optional[str] = None) -> List[dict]:
+    """
+    Generate top k university recommendations for a student
+    """
+    top_k = score_recommendations(student, universities, k, backend)
+    with span("persist"):
+        save_recommendations(student, top_k, db)
+    return format_recommendations(top_k)
+
+def generate_batch_recommendations(students: List[Student],
+                                   universities: Union[List[University], UniversityColumns], db: Session,
+                                   k: int = DEFAULT_TOP_K, backend: Optional[str] = None) -> List[List[dict]]:
+    """
+    Generate top k recommendations for every student of a cohort
+    Students must already have ids (flushed); all Recommendation rows are
+    bulk-inserted and committed together with them. Results keep input order.
+    """
+    with span("batch_score"):
+        results = BATCH_SCORING_BACKENDS[_resolve_backend(backend)](students, universities, k)
+    
+    with span("batch_persist"):
+        rows = []
+        for student, top_k in zip(students, results):
+            rows.extend(recommendation_rows(student.id, top_k))
+        db.bulk_insert_mappings(Recommendation, rows)
+        record_analytics(db, len(students), rows)
+        
+        db.commit()
+    return [format_recommendations(top_k) for top_k in results]
@@ -0,0 +1,300 @@
+"""
+Background jobs for scraping, shared by every worker process
+Scrapes run as asyncio tasks behind a concurrency cap instead of inside the
+request that asked for them. Job state lives in the scrape_jobs table, so any
+worker can report on a job another worker runs. Submitting a job identical to
+one that is still queued or running, in any worker, returns the existing job,
+and an optional periodic refresh submits the default scrape on a timer.
+"""
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from metrics import record_error
+from models import ScrapeJob
+
+# Scrapes allowed to run at once per worker (each holds browser pages)
+MAX_CONCURRENT_JOBS = int(os.getenv("EDUINTEL_SCRAPE_CONCURRENCY", "1"))
+
+# Seconds between scheduled refreshes of the default sources; 0 disables them
+REFRESH_INTERVAL = float(os.getenv("EDUINTEL_SCRAPE_INTERVAL", "0"))
+
+# Seconds between status checks while waiting on a job another worker runs
+WAIT_POLL_INTERVAL = 1.0
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Identifies this process among workers, even if a restarted worker reuses a pid
+WORKER_ID = uuid.uuid4().hex
+
+# runner(params, progress) -> result; progress(done, total) reports pages scraped
+JobRunner = Callable[[dict, Callable[[int, int], None]], Awaitable[dict]]
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite returns naive datetimes; they were stored as UTC
+    return value.replace(tzinfo=timezone.utc) if value is not None and value.tzinfo is None else value
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Job:
+    """A submitted scrape and its progress"""
+
+    def __init__(self, key: str, params: dict):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.params = params
+        self.status = "queued"
+        self.done = 0
+        self.total = 0
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.created_at = _now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.worker_pid = os.getpid()
+        self.worker_id = WORKER_ID
+
+    @classmethod
+    def from_row(cls, row: ScrapeJob) -> "Job":
+        job = cls.__new__(cls)
+        job.id = row.id
+        job.key = row.active_key
+        job.params = json.loads(row.params)
+        job.status = row.status
+        job.done = row.done
+        job.total = row.total
+        job.result = json.loads(row.result) if row.result is not None else None
+        job.error = row.error
+        job.created_at = _utc(row.created_at)
+        job.started_at = _utc(row.started_at)
+        job.finished_at = _utc(row.finished_at)
+        job.worker_pid = row.worker_pid
+        job.worker_id = row.worker_id
+        return job
+
+    def to_row(self, row: ScrapeJob):
+        row.active_key = self.key if self.status in ACTIVE_STATUSES else None
+        row.params = json.dumps(self.params)
+        row.status = self.status
+        row.done = self.done
+        row.total = self.total
+        row.result = json.dumps(self.result, default=str) if self.result is not None else None
+        row.error = self.error
+        row.worker_pid = self.worker_pid
+        row.worker_id = self.worker_id
+        row.created_at = self.created_at
+        row.started_at = self.started_at
+        row.finished_at = self.finished_at
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "progress": {"done": self.done, "total": self.total},
+            "result": self.result,
+            "error": self.error,
+            "worker": self.worker_pid,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobScheduler:
+    """
+    Runs jobs on this worker's event loop, at most max_concurrent at a time
+    A job runs in the worker that submitted it; its row is updated as it
+    starts, reports progress and finishes. Finished jobs are kept for status
+    queries, oldest deleted beyond `history`. Database work runs on a thread.
+    """
+
+    def __init__(self, runner: JobRunner, session_factory, max_concurrent: int = MAX_CONCURRENT_JOBS,
+                 refresh_interval: float = REFRESH_INTERVAL, history: int = 100):
+        self.runner = runner
+        self.session_factory = session_factory
+        self.max_concurrent = max_concurrent
+        self.refresh_interval = refresh_interval
+        self.history = history
+        # Jobs running in this process, with their tasks
+        self._local: Dict[str, Job] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._progress: Dict[str, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def job_key(params: dict) -> str:
+        return json.dumps(sorted((name, repr(value)) for name, value in params.items()))
+
+    async def submit(self, params: Optional[dict] = None) -> Job:
+        """Queue a job, or return the identical job already queued/running in any worker"""
+        job = Job(self.job_key(params or {}), params or {})
+        claimed = await asyncio.to_thread(self._claim, job)
+        if claimed is not job:
+            return claimed
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._local[job.id] = job
+        self._tasks[job.id] = asyncio.create_task(self._run(job))
+        return job
+
+    def _claim(self, job: Job) -> Job:
+        """Insert job as the active one for its key, or return the job already active"""
+        with self.session_factory() as db:
+            while True:
+                row = ScrapeJob(id=job.id)
+                job.to_row(row)
+                db.add(row)
+                try:
+                    db.commit()
+                    return job
+                except IntegrityError:
+                    db.rollback()
+                active = db.execute(select(ScrapeJob).where(ScrapeJob.active_key == job.key)).scalar_one_or_none()
+                if active is None:
+                    # Finished between the insert and the lookup
+                    continue
+                if active.worker_id == WORKER_ID:
+                    return self._local.get(active.id) or Job.from_row(active)
+                if active.worker_pid != os.getpid() and _pid_alive(active.worker_pid):
+                    return Job.from_row(active)
+                # Left behind by a worker that exited (or this pid's previous process)
+                active.status = "failed"
+                active.error = "Worker exited before the job finished"
+                active.active_key = None
+                active.finished_at = _now()
+                db.commit()
+
+    def _store(self, job: Job):
+        with self.session_factory() as db:
+            row = db.get(ScrapeJob, job.id) or ScrapeJob(id=job.id)
+            job.to_row(row)
+            db.add(row)
+            if not job.active:
+                self._trim(db)
+            db.commit()
+
+    def _trim(self, db):
+        stale = db.execute(
+            select(ScrapeJob.id).where(ScrapeJob.active_key.is_(None))
+            .order_by(ScrapeJob.created_at.desc()).offset(self.history)
+        ).scalars().all()
+        for job_id in stale:
+            db.delete(db.get(ScrapeJob, job_id))
+
+    def _load(self, job_id: str) -> Optional[Job]:
+        with self.session_factory() as db:
+            row = db.get(ScrapeJob, job_id)
+            return Job.from_row(row) if row is not None else None
+
+    def _load_all(self) -> List[Job]:
+        with self.session_factory() as db:
+            rows = db.execute(
+                select(ScrapeJob).order_by(ScrapeJob.created_at.desc()).limit(self.history)
+            ).scalars().all()
+            return [Job.from_row(row) for row in reversed(rows)]
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = self._local.get(job_id)
+        if job is not None:
+            return job
+        return await asyncio.to_thread(self._load, job_id)
+
+    async def jobs(self) -> List[Job]:
+        """Recent jobs of every worker, oldest first"""
+        jobs = await asyncio.to_thread(self._load_all)
+        return [self._local.get(job.id, job) for job in jobs]
+
+    async def wait(self, job: Job) -> Job:
+        task = self._tasks.get(job.id)
+        if task is not None:
+            await asyncio.shield(task)
+            return job
+        while job.active:
+            await asyncio.sleep(WAIT_POLL_INTERVAL)
+            job = await asyncio.to_thread(self._load, job.id) or job
+        return job
+
+    def _report(self, job: Job, done: int, total: int):
+        job.done = done
+        job.total = total
+        # One progress write in flight per job; the next report catches up
+        pending = self._progress.get(job.id)
+        if pending is None or pending.done():
+            self._progress[job.id] = asyncio.create_task(asyncio.to_thread(self._store, job))
+
+    async def _run(self, job: Job):
+        try:
+            async with self._semaphore:
+                job.status = "running"
+                job.started_at = _now()
+                await asyncio.to_thread(self._store, job)
+                job.result = await self.runner(job.params, lambda done, total: self._report(job, done, total))
+                job.status = "succeeded"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            record_error("scrape_job", e)
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = _now()
+            pending = self._progress.pop(job.id, None)
+            if pending is not None:
+                await asyncio.gather(pending, return_exceptions=True)
+            try:
+                await asyncio.to_thread(self._store, job)
+            except Exception as e:
+                record_error("scrape_job", e)
+            self._local.pop(job.id, None)
+            self._tasks.pop(job.id, None)
+
+    async def _refresh(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.submit()
+            except Exception as e:
+                record_error("scrape_refresh", e)
+
+    def start(self):
+        """Start the periodic refresh (call from a running event loop)"""
+        if self.refresh_interval > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh())
+
+    async def close(self):
+        """Stop the refresh timer and cancel this worker's unfinished jobs"""
+        tasks = list(self._tasks.values())
+        if self._refresh_task is not None:
+            tasks.append(self._refresh_task)
+            self._refresh_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,31 +1,59 @@
 """
 FastAPI Backend for AI-Assisted Overseas Education Platform
 """
-from fastapi import FastAPI, Depends, HTTPException
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi import Request
 
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from scraper.university_scraper import scrape_universities
-from typing import List
+from sqlalchemy import select
+from scraper.university_scraper import scrape_universities, url_allowed
+from scraper.browser_pool import browser_pool
+from typing import List, Literal, Optional
 
 
 from models import (
     StudentProfile,
     RecommendationResponse,
+    BatchRecommendationResponse,
     CounselorReviewRequest,
     CounselorReviewResponse,
     AnalyticsResponse,
+    TimeseriesPoint,
+    ScrapeJobRequest,
     Student,
     University,
     Recommendation,
     CounselorReview
 )
-from database import init_db, get_db
-from engine import generate_recommendations
-from data import initialize_universities, get_all_universities
+from database import init_db, get_db, get_async_db, SessionLocal, engine, async_engine
+from engine import (
+    generate_batch_recommendations,
+    score_recommendations,
+    recommendation_rows,
+    format_recommendations,
+    DEFAULT_TOP_K
+)
+from data import initialize_universities
+from catalog import catalog
+from cache import combine_stats as combine_cache_stats, recommendation_cache, scoring_key
+from persistence import WriteBehindQueue, WRITE_BEHIND_ENABLED, combine_stats as combine_persistence_stats
+from pagination import keyset_page, stream_ndjson
+from serialization import fast_json
+from analytics import analytics_writes, ensure_summary, read_summary, read_timeseries, utc_now, DEFAULT_ANALYTICS
+from jobs import JobScheduler
+from metrics import (
+    CONTENT_TYPE, METRICS_DIR, MetricsMiddleware, install_sql_hooks, metrics_publisher, record_error,
+    register_worker_stats, render_metrics, span, worker_stats
+)
+from profiling import ProfilingMiddleware, PROFILE_TOKEN, PROFILING_ENABLED, admin_token_valid, profiler
+from sync import MongoSync, MONGO_SYNC_ENABLED
 from mongodb import mongo_db
 
 
@@ -44,16 +72,76 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency per route, plus SQL statement timings on both engines (GET /metrics)
+app.add_middleware(MetricsMiddleware)
+install_sql_hooks(engine)
+install_sql_hooks(async_engine.sync_engine)
+
+# Sampling profiler for armed requests (EDUINTEL_PROFILING=1); not installed otherwise
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Background writer for Student/Recommendation rows (EDUINTEL_WRITE_BEHIND=1)
+write_behind = WriteBehindQueue(SessionLocal) if WRITE_BEHIND_ENABLED else None
+
+# Published with this worker's metrics, so any worker can report on all of them
+register_worker_stats("recommend_cache", recommendation_cache.stats)
+if write_behind:
+    register_worker_stats("persistence", write_behind.stats)
+
+
+async def run_scrape_job(params: dict, progress):
+    return await scrape_universities(params.get("urls"), progress=progress,
+                                     incremental=params.get("incremental", True))
+
+
+# Scrapes run in the background, deduplicated across workers and capped (EDUINTEL_SCRAPE_CONCURRENCY)
+scrape_jobs = JobScheduler(run_scrape_job, SessionLocal)
+
+# Streams scraped Mongo documents into the SQL catalog (EDUINTEL_MONGO_SYNC=1)
+mongo_sync = MongoSync(mongo_db.universities, SessionLocal) if MONGO_SYNC_ENABLED else None
+
+
 @app.on_event("startup")
 def startup_event():
     init_db()
     db = next(get_db())
     try:
         initialize_universities(db)
+        catalog.load(db)
     except Exception as e:
         print(f"Database initialization note: {e}")
+        db.rollback()
+    try:
+        # On its own: without the row, every summary_update would match nothing
+        ensure_summary(db)
+    except Exception as e:
+        print(f"Error creating analytics summary: {e}")
     finally:
         db.close()
+    if write_behind:
+        write_behind.start()
+    metrics_publisher.start()
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    scrape_jobs.start()
+    if mongo_sync:
+        mongo_sync.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await scrape_jobs.close()
+    if mongo_sync:
+        await mongo_sync.close()
+    if write_behind:
+        await run_in_threadpool(write_behind.close)
+    await run_in_threadpool(metrics_publisher.close)
+    # Pooled aiosqlite connections each hold a thread; close them before exit
+    await async_engine.dispose()
+    await browser_pool.close()
 
 
 # ✅ VERSION 1 ROOT (FULL ENDPOINT LIST)
@@ -64,10 +152,21 @@ def root():
         "version": "1.0.0",
         "endpoints": {
             "POST /recommend": "Get university recommendations",
+            "POST /recommend/batch": "Get recommendations for a cohort of students",
+            "GET /recommend/cache": "Recommendation cache hit/miss counters",
+            "GET /persistence/stats": "Write-behind queue depth and flush latency",
             "POST /review": "Submit counselor review",
             "GET /analytics": "Get platform analytics",
-            "GET /students": "Get all students",
-            "GET /universities": "Get all universities",
+            "GET /analytics/timeseries": "Per-minute/hour/day analytics trends",
+            "GET /students": "Get students (keyset pages via limit/after, or NDJSON stream)",
+            "GET /universities": "Get universities (keyset pages via limit/after, or NDJSON stream)",
+            "GET /scrape": "Run a scrape and wait for it (shares any identical running job)",
+            "POST /scrape/jobs": "Start a background scrape job",
+            "GET /scrape/jobs/{id}": "Scrape job status and progress",
+            "GET /sync/stats": "Mongo to SQL catalog sync progress",
+            "GET /metrics": "Prometheus latency histograms and error counters",
+            "POST /admin/profiling": "Profile the next N requests (EDUINTEL_PROFILING=1)",
+            "GET /admin/profiling": "Profiling state and collected profiles",
             "GET /mongo-test": "Test MongoDB connection"
         }
     }
@@ -79,8 +178,38 @@ async def mongo_test():
     return {"status": "MongoDB connected successfully"}
 
 
+# Student columns queued by the write-behind path
+STUDENT_COLUMNS = ("name", "cgpa", "ielts", "budget", "country", "field", "career_goal")
+
+
+def _score_profile(student: Student, k: int, strict: bool) -> List[dict]:
+    """
+    Score a student against the catalog (CPU-bound; run in the threadpool)
+    A database session is only used if the catalog has to be (re)loaded.
+    """
+    with SessionLocal() as db, span("catalog"):
+        # Served from the in-memory catalog; only reloads after a table change
+        universities = catalog.get(db)
+
+        if not len(universities):
+            initialize_universities(db)
+            universities = catalog.get(db)
+
+        if strict:
+            # Narrow with index range queries so scoring cost follows the eligible count
+            index = catalog.get_index(db)
+            universities = index.cols.take(index.strict_candidates(student))
+
+    return score_recommendations(student, universities, k)
+
+
 @app.post("/recommend", response_model=List[RecommendationResponse])
-def get_recommendations(profile: StudentProfile, db: Session = Depends(get_db)):
+async def get_recommendations(
+    profile: StudentProfile,
+    k: int = Query(DEFAULT_TOP_K, ge=1, le=100, description="Number of recommendations to return"),
+    strict: bool = Query(False, description="Only score programs the student is eligible for"),
+    db: AsyncSession = Depends(get_async_db)
+):
     try:
         student = Student(
             name=profile.name,
@@ -91,29 +220,172 @@ def get_recommendations(profile: StudentProfile, db: Session = Depends(get_db)):
             field=profile.field,
             career_goal=profile.careerGoal
         )
-        db.add(student)
-        db.commit()
-        db.refresh(student)
 
-        universities = get_all_universities(db)
+        # Identical scoring inputs reuse the cached top k; rows are still recorded
+        with span("cache_lookup"):
+            cache_key = scoring_key(profile, k, strict)
+            catalog_version = catalog.current_version()
+            top_k = recommendation_cache.get(cache_key, catalog_version)
+
+        if top_k is None:
+            top_k = await run_in_threadpool(_score_profile, student, k, strict)
+            recommendation_cache.put(cache_key, top_k, catalog_version)
+
+        if write_behind:
+            with span("persist_enqueue"):
+                # Stamped now, so rows and rollup buckets reflect the request, not the flush
+                created_at = utc_now()
+                student_row = {column: getattr(student, column) for column in STUDENT_COLUMNS}
+                student_row["created_at"] = created_at
+                recommendations = [dict(row, created_at=created_at) for row in recommendation_rows(None, top_k)]
+                if not write_behind.try_submit(student_row, recommendations):
+                    # Queue is full: wait for room off the event loop
+                    await run_in_threadpool(write_behind.submit, student_row, recommendations)
+            return fast_json(format_recommendations(top_k))
+
+        # Student and recommendations are written in one transaction
+        with span("persist_student"):
+            db.add(student)
+            await db.flush()
+        with span("persist_recommendations"):
+            rows = recommendation_rows(student.id, top_k)
+            db.add_all([Recommendation(**row) for row in rows])
+            for statement, params in analytics_writes(1, rows):
+                await db.execute(statement, params)
+            await db.commit()
+
+        return fast_json(format_recommendations(top_k))
+
+    except Exception as e:
+        record_error("/recommend", e)
+        raise HTTPException(status_code=500, detail=str(e))
 
-        if not universities:
-            initialize_universities(db)
-            universities = get_all_universities(db)
 
-        recommendations = generate_recommendations(student, universities, db)
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
 
-        return recommendations
+
+def _require_profiling(token: Optional[str]):
+    if not PROFILING_ENABLED or not PROFILE_TOKEN:
+        raise HTTPException(
+            status_code=404,
+            detail="Profiling is disabled (set EDUINTEL_PROFILING=1 and EDUINTEL_PROFILE_TOKEN)"
+        )
+    if not admin_token_valid(token):
+        raise HTTPException(status_code=403, detail="Missing or invalid X-Profile-Token")
+
+
+@app.post("/admin/profiling")
+def arm_profiling(
+    requests: int = Query(1, ge=1, le=1000, description="Number of upcoming requests to profile"),
+    paths: Optional[List[str]] = Query(None, description="Path prefixes to profile (default /recommend, /analytics, /scrape)"),
+    x_profile_token: Optional[str] = Header(None)
+):
+    _require_profiling(x_profile_token)
+    profiler.arm(requests, paths)
+    return profiler.state()
+
+
+@app.get("/admin/profiling")
+def get_profiling_state(x_profile_token: Optional[str] = Header(None)):
+    _require_profiling(x_profile_token)
+    return profiler.state()
+
+
+@app.get("/admin/profiling/{profile_id}/{kind}")
+def download_profile(profile_id: str, kind: Literal["pstats", "folded"],
+                     x_profile_token: Optional[str] = Header(None)):
+    _require_profiling(x_profile_token)
+    path = profiler.file_path(profile_id, kind)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=f"{profile_id}.{kind}")
+
+
+@app.get("/persistence/stats")
+def get_persistence_stats():
+    if not write_behind:
+        return {"enabled": False}
+    if not METRICS_DIR:
+        return write_behind.stats()
+    workers = worker_stats("persistence")
+    return dict(combine_persistence_stats(workers.values()), workers=workers)
+
+
+@app.get("/recommend/cache")
+def get_recommendation_cache_stats():
+    if not METRICS_DIR:
+        return recommendation_cache.stats()
+    workers = worker_stats("recommend_cache")
+    return dict(combine_cache_stats(workers.values()), workers=workers)
+
+
+# Largest cohort accepted by /recommend/batch in one request
+MAX_BATCH_SIZE = 10000
+
+
+@app.post("/recommend/batch", response_model=List[BatchRecommendationResponse])
+def get_batch_recommendations(
+    profiles: List[StudentProfile],
+    response: Response,
+    k: int = Query(DEFAULT_TOP_K, ge=1, le=100, description="Number of recommendations per student"),
+    db: Session = Depends(get_db)
+):
+    if len(profiles) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch size exceeds {MAX_BATCH_SIZE} profiles")
+
+    try:
+        started = time.perf_counter()
+        students = [
+            Student(
+                name=profile.name,
+                cgpa=profile.cgpa,
+                ielts=profile.ielts,
+                budget=profile.budget,
+                country=profile.country,
+                field=profile.field,
+                career_goal=profile.careerGoal
+            )
+            for profile in profiles
+        ]
+        universities = catalog.get(db)
+
+        if not len(universities):
+            initialize_universities(db)
+            universities = catalog.get(db)
+
+        # Flush (not commit) to get ids; students and recommendations commit together
+        db.add_all(students)
+        db.flush()
+
+        results = generate_batch_recommendations(students, universities, db, k=k)
+
+        headers = {}
+        elapsed = time.perf_counter() - started
+        if elapsed > 0:
+            headers["X-Profiles-Per-Second"] = f"{len(profiles) / elapsed:.1f}"
+        response.headers.update(headers)
+
+        return fast_json(
+            [
+                {"studentId": student.id, "recommendations": recommendations}
+                for student, recommendations in zip(students, results)
+            ],
+            headers=headers
+        )
 
     except Exception as e:
+        db.rollback()
+        record_error("/recommend/batch", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/review", response_model=CounselorReviewResponse)
-def submit_review(review: CounselorReviewRequest, db: Session = Depends(get_db)):
+async def submit_review(review: CounselorReviewRequest, db: AsyncSession = Depends(get_async_db)):
     try:
-        student = db.query(Student).filter(Student.id == review.studentId).first()
-        if not student:
+        student_id = await db.scalar(select(Student.id).where(Student.id == review.studentId))
+        if student_id is None:
             raise HTTPException(status_code=404, detail="Student not found")
 
         counselor_review = CounselorReview(
@@ -122,7 +394,7 @@ def submit_review(review: CounselorReviewRequest, db: Session = Depends(get_db))
             comment=review.comment
         )
         db.add(counselor_review)
-        db.commit()
+        await db.commit()
 
         return {
             "success": True,
@@ -132,84 +404,145 @@ def submit_review(review: CounselorReviewRequest, db: Session = Depends(get_db))
     except HTTPException:
         raise
     except Exception as e:
+        record_error("/review", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/analytics", response_model=AnalyticsResponse)
 def get_analytics(db: Session = Depends(get_db)):
     try:
-        total_students = db.query(func.count(Student.id)).scalar() or 0
+        # Running totals from the summary row, maintained as rows are written
+        return read_summary(db)
 
-        avg_roi_query = db.query(func.avg(Recommendation.roi_score)).scalar()
-        avg_roi = round(avg_roi_query, 2) if avg_roi_query else 84.0
+    except Exception:
+        return dict(DEFAULT_ANALYTICS)
+
+
+@app.get("/analytics/timeseries", response_model=List[TimeseriesPoint])
+def get_analytics_timeseries(
+    start: Optional[datetime] = Query(None, alias="from", description="Inclusive start (default: 24h before `to`)"),
+    end: Optional[datetime] = Query(None, alias="to", description="Exclusive end (default: now)"),
+    bucket: Literal["minute", "hour", "day"] = Query("hour", description="Bucket width"),
+    country: Optional[str] = Query(None, description="University country; one series per country if omitted"),
+    combined: bool = Query(False, description="Without a country, sum all countries into one series"),
+    db: Session = Depends(get_db)
+):
+    # Rollups are stored as naive UTC
+    end = _as_naive_utc(end) if end else datetime.now(timezone.utc).replace(tzinfo=None)
+    start = _as_naive_utc(start) if start else end - timedelta(days=1)
+
+    return read_timeseries(db, start, end, bucket, country, combined)
+
+
+def _as_naive_utc(moment: datetime) -> datetime:
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+# Columns returned by the listing endpoints, in response key order
+STUDENT_LISTING = (
+    Student.id,
+    Student.name,
+    Student.cgpa,
+    Student.ielts,
+    Student.country,
+    Student.field,
+    Student.career_goal,
+    Student.budget
+)
 
-        visa_success_query = db.query(func.avg(Recommendation.visa_success)).scalar()
-        visa_success = round(visa_success_query, 2) if visa_success_query else 78.0
+UNIVERSITY_LISTING = (
+    University.id,
+    University.name,
+    University.country,
+    University.program,
+    University.tuition,
+    University.ranking
+)
 
-        high_risk_count = db.query(func.count(Recommendation.id)).filter(
-            Recommendation.risk_level == "High"
-        ).scalar() or 0
 
-        high_risk_cases = round(
-            (high_risk_count / total_students * 100) if total_students > 0 else 0, 2
+def _listing(columns, id_column, db: Session, response: Response,
+             limit: Optional[int], after: Optional[int], format: str):
+    """Shared body of /students and /universities"""
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_ndjson(SessionLocal, lambda stream_db: stream_db.query(*columns), id_column, after, limit),
+            media_type="application/x-ndjson"
         )
 
-        return {
-            "total_students": total_students if total_students > 0 else 1247,
-            "avg_roi": avg_roi,
-            "visa_success": visa_success,
-            "high_risk_cases": int(high_risk_cases) if high_risk_cases > 0 else 18,
-            "scholarship_success": 62.0
-        }
-
-    except Exception:
-        return {
-            "total_students": 1247,
-            "avg_roi": 84.0,
-            "visa_success": 78.0,
-            "high_risk_cases": 18,
-            "scholarship_success": 62.0
-        }
+    rows = keyset_page(db.query(*columns), id_column, after, limit).all()
+    headers = {}
+    # A full page means there may be more; the client passes this back as `after`
+    if limit is not None and len(rows) == limit:
+        headers["X-Next-After"] = str(rows[-1].id)
+    response.headers.update(headers)
+    return fast_json([row._asdict() for row in rows], headers=headers)
 
 
 @app.get("/students")
-def get_students(db: Session = Depends(get_db)):
-    students = db.query(Student).all()
-    return [
-        {
-            "id": s.id,
-            "name": s.name,
-            "cgpa": s.cgpa,
-            "ielts": s.ielts,
-            "country": s.country,
-            "field": s.field,
-            "career_goal": s.career_goal,
-            "budget": s.budget
-        }
-        for s in students
-    ]
+def get_students(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=10000, description="Page size (all rows if omitted)"),
+    after: Optional[int] = Query(None, description="Return rows with id greater than this cursor"),
+    format: Literal["json", "ndjson"] = Query("json", description="ndjson streams rows with constant memory"),
+    db: Session = Depends(get_db)
+):
+    return _listing(STUDENT_LISTING, Student.id, db, response, limit, after, format)
 
 
 @app.get("/universities")
-def get_universities(db: Session = Depends(get_db)):
-    universities = get_all_universities(db)
-    return [
-        {
-            "id": u.id,
-            "name": u.name,
-            "country": u.country,
-            "program": u.program,
-            "tuition": u.tuition,
-            "ranking": u.ranking
-        }
-        for u in universities
-    ]
+def get_universities(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=10000, description="Page size (all rows if omitted)"),
+    after: Optional[int] = Query(None, description="Return rows with id greater than this cursor"),
+    format: Literal["json", "ndjson"] = Query("json", description="ndjson streams rows with constant memory"),
+    db: Session = Depends(get_db)
+):
+    return _listing(UNIVERSITY_LISTING, University.id, db, response, limit, after, format)
 
 
 @app.get("/scrape")
 async def run_scraper():
-    result = await scrape_universities()
-    return result
+    job = await scrape_jobs.wait(await scrape_jobs.submit())
+    if job.status != "succeeded":
+        raise HTTPException(status_code=500, detail=job.error or f"Scrape job {job.status}")
+    return job.result
+
+
+@app.post("/scrape/jobs", status_code=202)
+async def create_scrape_job(request: Optional[ScrapeJobRequest] = None):
+    params = {}
+    if request and request.urls:
+        # The server fetches these, so only http(s) pages on the allowed hosts
+        rejected = [url for url in request.urls if not url_allowed(url)]
+        if rejected:
+            raise HTTPException(status_code=400, detail=f"URLs not allowed: {', '.join(rejected)}")
+        params["urls"] = request.urls
+    if request and not request.incremental:
+        params["incremental"] = False
+    job = await scrape_jobs.submit(params)
+    return job.to_dict()
+
+
+@app.get("/scrape/jobs")
+async def list_scrape_jobs():
+    return [job.to_dict() for job in await scrape_jobs.jobs()]
+
+
+@app.get("/sync/stats")
+def get_sync_stats():
+    if not mongo_sync:
+        return {"enabled": False}
+    return mongo_sync.stats()
+
+
+@app.get("/scrape/jobs/{job_id}")
+async def get_scrape_job(job_id: str):
+    job = await scrape_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
 
 
@@ -0,0 +1,348 @@
+"""
+Hot-path latency metrics in Prometheus text format
+
+Histograms for request latency per route, named stages of the recommendation
+path (span()), and SQL statements (install_sql_hooks()), plus a counter of
+errors by route and exception type. Observing a value is a bisect and a few
+additions under a lock, so instrumentation stays well under 1% of a request.
+Served by GET /metrics.
+
+With several workers (EDUINTEL_METRICS_DIR, set by serve.py), each worker
+writes its series, plus the stats registered with register_worker_stats(),
+to a file in that directory every EDUINTEL_METRICS_INTERVAL seconds. Any
+worker answering GET /metrics sums its own series with the other files.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+logger = logging.getLogger("eduintel")
+
+# Seconds; covers sub-millisecond scoring up to slow scrapes
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Shared directory for per-worker metrics files; unset, only this process is reported
+METRICS_DIR = os.getenv("EDUINTEL_METRICS_DIR", "")
+
+# Seconds between writes of this worker's metrics file
+METRICS_INTERVAL = float(os.getenv("EDUINTEL_METRICS_INTERVAL", "5"))
+
+
+def _label_text(names: Sequence[str], values: Tuple) -> str:
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # per-bucket counts (+Inf last), sum, count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def export(self) -> List:
+        """Series as JSON-ready [labels, bucket counts, sum, count] lists"""
+        with self._lock:
+            return [[list(labels), list(counts), total, count] for labels, (counts, total, count) in self._series.items()]
+
+    def render(self, exports: Optional[Iterable[List]] = None) -> List[str]:
+        """Text lines for this process's series, or for the sum of several exports"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        merged: Dict[Tuple, List] = {}
+        for export in ([self.export()] if exports is None else exports):
+            for labels, counts, total, count in export:
+                series = merged.setdefault(tuple(labels), [[0] * len(counts), 0.0, 0])
+                series[0] = [a + b for a, b in zip(series[0], counts)]
+                series[1] += total
+                series[2] += count
+        series = [(labels, counts, total, count) for labels, (counts, total, count) in merged.items()]
+        for labels, counts, total, count in sorted(series):
+            prefix = _label_text(self.labelnames, labels)
+            separator = "," if prefix else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{prefix}{separator}le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{prefix}}} {total}")
+            lines.append(f"{self.name}_count{{{prefix}}} {count}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: int = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def export(self) -> List:
+        """Series as JSON-ready [labels, value] lists"""
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+    def render(self, exports: Optional[Iterable[List]] = None) -> List[str]:
+        """Text lines for this process's series, or for the sum of several exports"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        merged: Dict[Tuple, int] = {}
+        for export in ([self.export()] if exports is None else exports):
+            for labels, value in export:
+                merged[tuple(labels)] = merged.get(tuple(labels), 0) + value
+        for labels, value in sorted(merged.items()):
+            lines.append(f"{self.name}{{{_label_text(self.labelnames, labels)}}} {value}")
+        return lines
+
+
+request_seconds = Histogram(
+    "eduintel_request_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+stage_seconds = Histogram(
+    "eduintel_stage_seconds", "Latency of recommendation path stages", ("stage",)
+)
+sql_seconds = Histogram(
+    "eduintel_sql_query_seconds", "SQL statement latency by statement type", ("operation",)
+)
+errors_total = Counter(
+    "eduintel_errors_total", "Unhandled and 500-mapped errors by route and exception type", ("route", "exception")
+)
+
+REGISTRY = (request_seconds, stage_seconds, sql_seconds, errors_total)
+
+
+# name -> callable returning this worker's stats (e.g. cache counters)
+WORKER_STATS: Dict[str, Callable[[], dict]] = {}
+
+
+def register_worker_stats(name: str, stats: Callable[[], dict]):
+    """Publish a stats callable in this worker's metrics file, for worker_stats()"""
+    WORKER_STATS[name] = stats
+
+
+def _worker_state() -> dict:
+    return {
+        "pid": os.getpid(),
+        "metrics": {metric.name: metric.export() for metric in REGISTRY},
+        "stats": {name: stats() for name, stats in WORKER_STATS.items()},
+    }
+
+
+def _worker_path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"worker-{pid}.json")
+
+
+def publish_worker_state():
+    """Write this worker's metrics file (temporary file, then os.replace)"""
+    path = _worker_path(os.getpid())
+    temporary = path + ".tmp"
+    with open(temporary, "w") as f:
+        json.dump(_worker_state(), f)
+    os.replace(temporary, path)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _worker_states() -> List[dict]:
+    """This worker's live state plus the last file of every other worker"""
+    states = [_worker_state()]
+    if not METRICS_DIR:
+        return states
+    try:
+        names = os.listdir(METRICS_DIR)
+    except OSError:
+        return states
+    own = os.path.basename(_worker_path(os.getpid()))
+    for name in names:
+        if not name.startswith("worker-") or not name.endswith(".json") or name == own:
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name)) as f:
+                states.append(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Error reading metrics file {name}: {e}")
+    return states
+
+
+def render_metrics() -> str:
+    """Prometheus text for every worker (or just this process without METRICS_DIR)"""
+    states = _worker_states()
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render([state["metrics"].get(metric.name, []) for state in states]))
+    return "\n".join(lines) + "\n"
+
+
+def worker_stats(name: str) -> Dict[int, dict]:
+    """
+    Registered stats by worker pid, this worker's fresh and the others' as last written
+    Workers that have exited are left out: their counters are history, but
+    gauges such as queue depth no longer describe anything.
+    """
+    return {
+        state["pid"]: state["stats"][name]
+        for state in _worker_states()
+        if name in state.get("stats", {}) and (state["pid"] == os.getpid() or _pid_alive(state["pid"]))
+    }
+
+
+class MetricsPublisher:
+    """Background thread writing this worker's metrics file every `interval` seconds"""
+
+    def __init__(self, interval: float = METRICS_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _publish(self):
+        try:
+            publish_worker_state()
+        except Exception as e:
+            print(f"Error writing metrics file: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._publish()
+
+    def start(self):
+        """Start publishing if METRICS_DIR is set"""
+        if METRICS_DIR and self._thread is None:
+            self._publish()
+            self._thread = threading.Thread(target=self._run, name="metrics-publisher", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Stop the thread and write the final state"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self._publish()
+
+
+metrics_publisher = MetricsPublisher()
+
+
+@contextmanager
+def span(stage: str):
+    """Time a block as one stage of the recommendation path"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, stage)
+
+
+def record_error(route: str, error: BaseException):
+    """Log an error with its traceback and count it"""
+    errors_total.inc(route, type(error).__name__)
+    logger.error("Error in %s: %s", route, error, exc_info=error)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement else "UNKNOWN"
+    sql_seconds.observe(time.perf_counter() - started, operation)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+def install_sql_hooks(sync_engine):
+    """Time every statement on an Engine (pass AsyncEngine.sync_engine for async engines)"""
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(sync_engine, "handle_error", _handle_error)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing requests by route template and status
+    Exceptions escaping the app are logged and counted before re-raising.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[object, str] = {}
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        route = self._routes.get(endpoint)
+        if route is None:
+            app = scope.get("app")
+            route = next(
+                (r.path for r in getattr(app, "routes", []) if getattr(r, "endpoint", None) is endpoint),
+                getattr(endpoint, "__name__", "unknown")
+            )
+            self._routes[endpoint] = route
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            record_error(self._route(scope), e)
+            raise
+        finally:
+            request_seconds.observe(time.perf_counter() - started, scope["method"], self._route(scope), str(status))
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Literal
-from sqlalchemy import Column, Integer, Float, String, Boolean, DateTime, Text
+from typing import List, Optional, Literal
+from sqlalchemy import Column, Integer, Float, String, Boolean, DateTime, Text, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -32,6 +32,22 @@ class RecommendationResponse(BaseModel):
     scholarshipAvailable: bool
     ranking: int
 
+class BatchRecommendationResponse(BaseModel):
+    studentId: int
+    recommendations: List[RecommendationResponse]
+
+class TimeseriesPoint(BaseModel):
+    bucket_start: datetime
+    country: Optional[str] = None
+    recommendations: int
+    avg_roi: float
+    visa_success: float
+    high_risk_share: float
+
+class ScrapeJobRequest(BaseModel):
+    urls: Optional[List[str]] = None
+    incremental: bool = True
+
 class CounselorReviewRequest(BaseModel):
     studentId: int
     status: Literal['AI Generated', 'Under Review', 'Approved', 'Modified', 'Rejected']
@@ -107,3 +123,76 @@ class CounselorReview(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+# Running totals behind /analytics, updated in the same transaction as the rows they count
+class AnalyticsSummary(Base):
+    __tablename__ = "analytics_summary"
+    
+    id = Column(Integer, primary_key=True)
+    total_students = Column(Integer, nullable=False, default=0)
+    total_recommendations = Column(Integer, nullable=False, default=0)
+    roi_sum = Column(Float, nullable=False, default=0.0)
+    visa_success_sum = Column(Float, nullable=False, default=0.0)
+    high_risk_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# Per-country totals for one minute/hour/day bucket, maintained as rows are written
+class AnalyticsRollup(Base):
+    __tablename__ = "analytics_rollups"
+    __table_args__ = (UniqueConstraint("bucket", "bucket_start", "country"),)
+    
+    id = Column(Integer, primary_key=True)
+    bucket = Column(String, nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    country = Column(String, nullable=False)
+    recommendations = Column(Integer, nullable=False, default=0)
+    roi_sum = Column(Float, nullable=False, default=0.0)
+    visa_success_sum = Column(Float, nullable=False, default=0.0)
+    high_risk_count = Column(Integer, nullable=False, default=0)
+
+# Last seen validators and body hash per scraped URL, for conditional re-scrapes
+class ScrapeSource(Base):
+    __tablename__ = "scrape_sources"
+    
+    id = Column(Integer, primary_key=True)
+    url = Column(String, nullable=False, unique=True)
+    etag = Column(String)
+    last_modified = Column(String)
+    content_hash = Column(String, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# Change counter of the universities table; catalog snapshots record the
+# token and generation they were built from (see catalog.py)
+class CatalogMeta(Base):
+    __tablename__ = "catalog_meta"
+    
+    id = Column(Integer, primary_key=True)
+    token = Column(String, nullable=False)
+    generation = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# Resume position of a named sync (e.g. a Mongo change-stream token or polling cursor)
+class SyncCheckpoint(Base):
+    __tablename__ = "sync_checkpoints"
+    
+    name = Column(String, primary_key=True)
+    position = Column(Text, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# Scrape jobs, shared by every worker; active_key is set while a job is queued
+# or running (NULL afterwards), so one identical job can be active at a time
+class ScrapeJob(Base):
+    __tablename__ = "scrape_jobs"
+    
+    id = Column(String, primary_key=True)
+    active_key = Column(String, unique=True)
+    params = Column(Text, nullable=False)
+    status = Column(String, nullable=False)
+    done = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)
+    result = Column(Text)
+    error = Column(Text)
+    worker_pid = Column(Integer, nullable=False)
+    worker_id = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
@@ -0,0 +1,51 @@
+"""
+Keyset pagination and NDJSON streaming for large listing endpoints
+"""
+from typing import Callable, Iterator, Optional
+
+from serialization import dumps_line
+
+# Rows fetched from the database per round trip while streaming
+STREAM_CHUNK_SIZE = 1000
+
+
+def keyset_page(query, id_column, after: Optional[int] = None, limit: Optional[int] = None):
+    """
+    Order a query by id and return the page after the `after` cursor
+    Filtering on `id > after` uses the primary key index, so every page costs
+    the same no matter how deep into the table it is (unlike OFFSET).
+    """
+    query = query.order_by(id_column)
+    if after is not None:
+        query = query.filter(id_column > after)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def stream_ndjson(session_factory, make_query: Callable, id_column, after: Optional[int] = None,
+                  limit: Optional[int] = None, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Yield query rows as newline-delimited JSON, one keyset page at a time
+    Each page is read in its own short session that is closed before the
+    page is sent, so a slow client holds neither a pooled connection nor an
+    open read transaction (which would keep SQLite from checkpointing the WAL).
+    Memory stays bounded by chunk_size whatever the table size. Pages are
+    separate reads: rows committed mid-stream past the cursor are included.
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        db = session_factory()
+        try:
+            rows = keyset_page(make_query(db), id_column, after, size).all()
+        finally:
+            db.close()
+        if not rows:
+            return
+        yield b"".join(dumps_line(row._asdict()) for row in rows)
+        if len(rows) < size:
+            return
+        after = getattr(rows[-1], id_column.key)
+        if remaining is not None:
+            remaining -= len(rows)
@@ -0,0 +1,197 @@
+"""
+Write-behind persistence for Student and Recommendation rows
+Requests put their rows on a bounded in-process queue; a background thread
+writes them in batches, one transaction per batch. A batch that fails is
+retried one job at a time, and only the jobs that still fail are dropped
+(and logged with their rows).
+"""
+import os
+import queue
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from analytics import record_analytics
+from models import Student, Recommendation
+
+# Enable with EDUINTEL_WRITE_BEHIND=1; rows are then written after the response
+WRITE_BEHIND_ENABLED = os.getenv("EDUINTEL_WRITE_BEHIND", "0") == "1"
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """
+    Bounded queue of (student row, recommendation rows) jobs
+    A full queue makes submit() block, which slows producers down to the rate
+    the database can absorb instead of growing memory without limit.
+    """
+
+    def __init__(self, session_factory, maxsize: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 0.05):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.flushes = 0
+        self.students_written = 0
+        self.recommendations_written = 0
+        self.failed_batches = 0
+        self.dropped_students = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush everything still queued, then stop the worker"""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def try_submit(self, student_row: dict, recommendation_rows: List[dict]) -> bool:
+        """Queue a job without blocking; False if the queue is full"""
+        try:
+            self._queue.put_nowait((student_row, recommendation_rows))
+            return True
+        except queue.Full:
+            return False
+
+    def submit(self, student_row: dict, recommendation_rows: List[dict], timeout: Optional[float] = None):
+        """Queue a job, blocking while the queue is full (backpressure)"""
+        self._queue.put((student_row, recommendation_rows), timeout=timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            # Collect more jobs for a short while so busy periods write in bulk
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stopping = True
+                batch = [job for job in batch if job is not _STOP]
+                # Drain whatever was queued behind the stop marker
+                while True:
+                    try:
+                        job = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if job is not _STOP:
+                        batch.append(job)
+            for start in range(0, len(batch), self.batch_size):
+                self._flush(batch[start:start + self.batch_size])
+
+    def _write(self, db, jobs: List[tuple]) -> int:
+        """Insert jobs' students, recommendations and analytics; returns recommendation rows"""
+        student_ids = db.execute(
+            insert(Student).returning(Student.id, sort_by_parameter_order=True),
+            [student_row for student_row, _ in jobs]
+        ).scalars().all()
+
+        recommendation_rows = []
+        for student_id, (_, rows) in zip(student_ids, jobs):
+            for row in rows:
+                recommendation_rows.append(dict(row, student_id=student_id))
+        if recommendation_rows:
+            db.execute(insert(Recommendation), recommendation_rows)
+        record_analytics(db, len(jobs), recommendation_rows)
+        db.commit()
+        return len(recommendation_rows)
+
+    def _write_each(self, jobs: List[tuple]) -> Tuple[int, int]:
+        """
+        Retry a failed batch one job per transaction, so one bad row only loses itself
+        Jobs that still fail are logged with their rows. Returns (students, recommendations) written.
+        """
+        students = recommendations = 0
+        for job in jobs:
+            db = self.session_factory()
+            try:
+                recommendations += self._write(db, [job])
+                students += 1
+            except Exception as e:
+                db.rollback()
+                student_row, rows = job
+                with self._lock:
+                    self.dropped_students += 1
+                print(f"Write-behind dropped student {student_row} with recommendations for "
+                      f"university ids {[row.get('university_id') for row in rows]}: {e}")
+            finally:
+                db.close()
+        return students, recommendations
+
+    def _flush(self, batch: List[tuple]):
+        if not batch:
+            return
+        started = time.perf_counter()
+        db = self.session_factory()
+        try:
+            students, recommendations = len(batch), self._write(db, batch)
+        except Exception as e:
+            db.rollback()
+            with self._lock:
+                self.failed_batches += 1
+            print(f"Write-behind flush failed for {len(batch)} students, retrying one by one: {e}")
+            students = recommendations = None
+        finally:
+            db.close()
+        if students is None:
+            students, recommendations = self._write_each(batch)
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.flushes += 1
+            self.students_written += students
+            self.recommendations_written += recommendations
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self.total_flush_seconds += elapsed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self._thread is not None,
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "flushes": self.flushes,
+                "students_written": self.students_written,
+                "recommendations_written": self.recommendations_written,
+                "failed_batches": self.failed_batches,
+                "dropped_students": self.dropped_students,
+                "last_flush_ms": round(self.last_flush_seconds * 1000, 3),
+                "max_flush_ms": round(self.max_flush_seconds * 1000, 3),
+                "avg_flush_ms": round(self.total_flush_seconds / self.flushes * 1000, 3) if self.flushes else 0.0,
+            }
+
+
+def combine_stats(stats: Iterable[dict]) -> dict:
+    """
+    stats() of several workers' queues as one
+    Counts are summed and flush latency is the worst maximum and the
+    flush-weighted average; last_flush_ms is only meaningful per worker.
+    """
+    stats = list(stats)
+    flushes = sum(s["flushes"] for s in stats)
+    combined = {"enabled": any(s["enabled"] for s in stats)}
+    for field in ("queue_depth", "queue_capacity", "flushes", "students_written",
+                  "recommendations_written", "failed_batches", "dropped_students"):
+        combined[field] = sum(s[field] for s in stats)
+    combined["max_flush_ms"] = max((s["max_flush_ms"] for s in stats), default=0.0)
+    combined["avg_flush_ms"] = round(sum(s["avg_flush_ms"] * s["flushes"] for s in stats) / flushes, 3) if flushes else 0.0
+    return combined
@@ -0,0 +1,381 @@
+"""
+On-demand profiling of production requests
+
+With EDUINTEL_PROFILING=1 and a secret in EDUINTEL_PROFILE_TOKEN, POST
+/admin/profiling (authenticated by the `X-Profile-Token` header) arms
+profiling for the next N requests to /recommend, /analytics or /scrape. A
+request whose `X-Profile` header carries the secret is also profiled on its
+own; without the secret the header is ignored. While a profiled request runs, a
+stack sampler reads every thread's stack each `interval` seconds. Work the
+request hands to the threadpool (scoring, sync endpoints) is included, which
+cProfile would miss because it only traces the thread it was enabled on.
+
+Samples are process-wide: other requests running on the same threads at the
+same time are included too. Each profile records the peak number of such
+concurrent requests, so profiles taken under load can be told apart.
+
+Each profile is stored twice, next to a .json entry describing it:
+- .pstats: sample counts converted to pstats format (pstats.Stats, snakeviz)
+- .folded: collapsed stacks for flamegraph.pl or speedscope
+
+The armed budget is a file in the same directory, so with several workers
+it is shared: arming through any worker profiles the next N requests
+whichever worker receives them.
+
+Without EDUINTEL_PROFILING=1 the middleware is not installed at all.
+"""
+import hmac
+import json
+import linecache
+import marshal
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+PROFILING_ENABLED = os.getenv("EDUINTEL_PROFILING", "0") == "1"
+
+PROFILE_DIR = os.getenv("EDUINTEL_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "eduintel-profiles"))
+
+# Path prefixes that can be profiled
+PROFILED_PATHS = ("/recommend", "/analytics", "/scrape")
+
+PROFILE_HEADER = b"x-profile"
+
+# Secret an X-Profile header must carry; unset, the header profiles nothing
+PROFILE_TOKEN = os.getenv("EDUINTEL_PROFILE_TOKEN", "").encode()
+
+PROFILE_ID = re.compile(r"[0-9a-f]{32}")
+
+SAMPLE_INTERVAL = 0.001
+
+# (file, function) pairs a thread sits in while it has nothing to do
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+}
+
+# Worker loops that block inside a C-level SimpleQueue.get(), so the waiting
+# frame is the loop itself; idle when stopped on the line containing the text
+IDLE_LINES = {
+    ("thread.py", "_worker"): "work_queue.get(",
+    ("core.py", "_connection_worker_thread"): "tx.get(",
+}
+
+FrameKey = Tuple[str, int, str]
+
+
+def _frame_key(code) -> FrameKey:
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    name = (os.path.basename(code.co_filename), code.co_name)
+    if name in IDLE_FRAMES:
+        return True
+    blocking = IDLE_LINES.get(name)
+    return blocking is not None and blocking in linecache.getline(code.co_filename, frame.f_lineno)
+
+
+def admin_token_valid(token: Optional[str]) -> bool:
+    """Whether an admin request's X-Profile-Token header carries PROFILE_TOKEN"""
+    return bool(PROFILE_TOKEN) and token is not None and hmac.compare_digest(token.encode(), PROFILE_TOKEN)
+
+
+def profile_requested(headers: Sequence[Tuple[bytes, bytes]]) -> bool:
+    """Whether the request's X-Profile header carries PROFILE_TOKEN"""
+    return bool(PROFILE_TOKEN) and any(
+        name == PROFILE_HEADER and hmac.compare_digest(value, PROFILE_TOKEN) for name, value in headers
+    )
+
+
+class StackSampler:
+    """
+    Samples the stacks of all other threads on a background thread
+    Stacks are process-wide; `in_flight` (requests running right now) is
+    sampled alongside so the profile can report how many ran concurrently.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, in_flight: Optional[Callable[[], int]] = None):
+        self.interval = interval
+        self.in_flight = in_flight
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.peak_in_flight = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            if self.in_flight is not None:
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight())
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                if _is_idle(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_key(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                self.stacks[tuple(stack)] += 1
+
+
+def folded_stacks(stacks: Counter) -> str:
+    """Collapsed-stack text: "root;caller;leaf count" per line"""
+    lines = []
+    for stack, count in stacks.most_common():
+        frames = ";".join(f"{name} ({os.path.basename(filename)}:{line})" for filename, line, name in stack)
+        lines.append(f"{frames} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def pstats_dict(stacks: Counter, interval: float) -> Dict:
+    """
+    Samples as a pstats stats mapping
+    Call counts are sample counts; times are samples x interval seconds.
+    """
+    own: Counter = Counter()
+    inclusive: Counter = Counter()
+    callers: Dict[FrameKey, Counter] = {}
+    for stack, count in stacks.items():
+        own[stack[-1]] += count
+        for function in set(stack):
+            inclusive[function] += count
+        for caller, callee in set(zip(stack, stack[1:])):
+            callers.setdefault(callee, Counter())[caller] += count
+
+    stats = {}
+    for function, count in inclusive.items():
+        function_callers = {
+            caller: (calls, calls, 0.0, calls * interval)
+            for caller, calls in callers.get(function, {}).items()
+        }
+        stats[function] = (count, count, own[function] * interval, count * interval, function_callers)
+    return stats
+
+
+class Profiler:
+    """
+    Armed-request budget and the profiles collected so far
+    Both live in `directory` (a budget file and one .json per profile), so
+    with several workers arming on one covers requests landing on any of them,
+    and every worker lists and serves the same profiles.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, paths: Sequence[str] = PROFILED_PATHS,
+                 interval: float = SAMPLE_INTERVAL, keep: int = 50):
+        self.directory = directory
+        self.paths = tuple(paths)
+        self.interval = interval
+        self.keep = keep
+        self._lock = threading.Lock()
+        # (file identity, remaining, paths) of the budget file last read
+        self._budget: Tuple[Optional[Tuple[int, int]], int, Tuple[str, ...]] = (None, 0, self.paths)
+
+    @property
+    def _budget_path(self) -> str:
+        return os.path.join(self.directory, "armed.json")
+
+    @contextmanager
+    def _locked(self):
+        """Serialize budget and index updates across threads and processes"""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(os.path.join(self.directory, "profiles.lock"), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _read_budget(self) -> Tuple[int, Tuple[str, ...]]:
+        try:
+            with open(self._budget_path) as f:
+                budget = json.load(f)
+            return budget["remaining"], tuple(budget["paths"])
+        except (OSError, ValueError, KeyError):
+            return 0, self.paths
+
+    def _write_budget(self, remaining: int, paths: Sequence[str]):
+        temporary = f"{self._budget_path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            json.dump({"remaining": remaining, "paths": list(paths)}, f)
+        os.replace(temporary, self._budget_path)
+
+    def budget(self) -> Tuple[int, Tuple[str, ...]]:
+        """(remaining, paths), re-read only when the budget file was replaced"""
+        try:
+            stat = os.stat(self._budget_path)
+        except OSError:
+            return 0, self.paths
+        identity = (stat.st_ino, stat.st_mtime_ns)
+        if identity != self._budget[0]:
+            self._budget = (identity,) + self._read_budget()
+        return self._budget[1], self._budget[2]
+
+    def arm(self, requests: int, paths: Optional[Sequence[str]] = None):
+        with self._locked():
+            self._write_budget(requests, paths or self._read_budget()[1])
+
+    def claim(self, path: str, header: bool) -> bool:
+        """
+        Whether to profile a request to path, using up an armed slot if needed
+        `header` is whether the request carries the profiling secret (profile_requested()).
+        """
+        remaining, paths = self.budget()
+        if not path.startswith(paths):
+            return False
+        if header:
+            return True
+        if remaining <= 0:
+            return False
+        with self._locked():
+            # Another worker may have taken the last slot since the cached read
+            remaining, paths = self._read_budget()
+            if remaining <= 0:
+                return False
+            self._write_budget(remaining - 1, paths)
+            return True
+
+    def save(self, method: str, path: str, status: int, duration: float, sampler: StackSampler) -> dict:
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = uuid.uuid4().hex
+        base = os.path.join(self.directory, profile_id)
+        with open(base + ".pstats", "wb") as f:
+            marshal.dump(pstats_dict(sampler.stacks, self.interval), f)
+        with open(base + ".folded", "w") as f:
+            f.write(folded_stacks(sampler.stacks))
+
+        profile = {
+            "id": profile_id,
+            "method": method,
+            "path": path,
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+            "samples": sampler.samples,
+            # Stacks of every thread, including other requests running meanwhile
+            "scope": "process",
+            "concurrent_requests": max(0, sampler.peak_in_flight - 1),
+            "worker": os.getpid(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        with self._locked():
+            with open(base + ".json", "w") as f:
+                json.dump(profile, f)
+            for old in self.profiles()[:-self.keep]:
+                self._remove_files(old["id"])
+        return profile
+
+    def profiles(self) -> List[dict]:
+        """Profiles of every worker, oldest first"""
+        profiles = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return profiles
+        for name in names:
+            if not name.endswith(".json") or not PROFILE_ID.fullmatch(name[:-len(".json")]):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                # Removed by a trim, or still being written
+                continue
+        return sorted(profiles, key=lambda profile: profile["created_at"])
+
+    def _remove_files(self, profile_id: str):
+        for kind in ("json", "pstats", "folded"):
+            try:
+                os.remove(os.path.join(self.directory, f"{profile_id}.{kind}"))
+            except OSError:
+                pass
+
+    def file_path(self, profile_id: str, kind: str) -> Optional[str]:
+        if not PROFILE_ID.fullmatch(profile_id):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.{kind}")
+        return path if os.path.exists(path) else None
+
+    def state(self) -> dict:
+        remaining, paths = self.budget()
+        return {
+            "enabled": PROFILING_ENABLED,
+            "remaining": remaining,
+            "paths": list(paths),
+            "interval": self.interval,
+            "profiles": self.profiles(),
+        }
+
+
+profiler = Profiler()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware sampling the requests the profiler claims"""
+
+    def __init__(self, app, profiler: Profiler = profiler):
+        self.app = app
+        self.profiler = profiler
+        # HTTP requests currently running in this worker, profiled or not
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        self.in_flight += 1
+        try:
+            if self.profiler.claim(scope["path"], profile_requested(scope["headers"])):
+                await self._profile(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+    async def _profile(self, scope, receive, send):
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        sampler = StackSampler(self.profiler.interval, lambda: self.in_flight)
+        sampler.start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - started
+            sampler.stop()
+            # Writes two files; keep them off the event loop
+            await run_in_threadpool(self.profiler.save, scope["method"], scope["path"], status, duration, sampler)
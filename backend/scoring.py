@@ -0,0 +1,259 @@
+"""
+Columnar scoring engine - scores every university in one vectorized pass
+"""
+from typing import Dict, Sequence
+
+import numpy as np
+
+RISK_LEVELS = ("Low", "Medium", "High")
+
+FLOAT_COLUMNS = (
+    "avg_salary",
+    "tuition",
+    "visa_rate",
+    "acceptance_rate",
+    "employment_rate",
+    "risk_index",
+    "ielts_requirement",
+    "cgpa_requirement",
+)
+
+# Student-independent score parts precomputed for every catalog entry
+STATIC_COLUMNS = (
+    "roi",
+    "employability",
+    "visa_success",
+    "roi_term",
+    "employability_term",
+    "visa_term",
+    "roi_confidence",
+)
+
+
+def round_like_python(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """
+    Round an array exactly like the builtin round()
+    np.round scales by 10**ndigits first, which can land on the wrong side of
+    a tie; those few near-tie values are re-rounded with the builtin.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, ndigits)
+    scaled = values * (10.0 ** ndigits)
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        flat_values = values.reshape(-1)
+        flat_rounded = rounded.reshape(-1)
+        for idx in np.flatnonzero(near_tie):
+            flat_rounded[idx] = round(float(flat_values[idx]), ndigits)
+    return rounded
+
+
+class UniversityColumns:
+    """
+    University attributes stored as NumPy arrays, one array per column
+    `rows` keeps the source objects so the top results can be formatted.
+    """
+
+    def __init__(self, rows: Sequence):
+        self.rows = list(rows)
+        count = len(self.rows)
+        for column in FLOAT_COLUMNS:
+            setattr(self, column, np.fromiter(
+                (getattr(u, column) for u in self.rows), dtype=np.float64, count=count
+            ))
+
+        # Countries are compared case-insensitively, so encode them once as ints
+        self.country_codes: Dict[str, int] = {}
+        self.country_code = np.fromiter(
+            (self.country_codes.setdefault(u.country.lower(), len(self.country_codes))
+             for u in self.rows),
+            dtype=np.int32,
+            count=count,
+        )
+
+        for name, values in static_components(self).items():
+            setattr(self, name, values)
+
+    @classmethod
+    def from_arrays(cls, rows: Sequence, arrays: Dict[str, np.ndarray],
+                    country_codes: Dict[str, int]) -> "UniversityColumns":
+        """
+        Columns over existing arrays (e.g. views into a mapped snapshot)
+        `arrays` holds FLOAT_COLUMNS, STATIC_COLUMNS and country_code; nothing is copied.
+        """
+        cols = cls.__new__(cls)
+        cols.rows = rows
+        for column in FLOAT_COLUMNS + STATIC_COLUMNS + ("country_code",):
+            setattr(cols, column, arrays[column])
+        cols.country_codes = country_codes
+        return cols
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def take(self, indexes: np.ndarray) -> "UniversityColumns":
+        """Subset of the catalog, in the order of `indexes`"""
+        subset = UniversityColumns.__new__(UniversityColumns)
+        subset.rows = [self.rows[i] for i in indexes]
+        for column in FLOAT_COLUMNS:
+            setattr(subset, column, getattr(self, column)[indexes])
+        subset.country_codes = self.country_codes
+        subset.country_code = self.country_code[indexes]
+        for column in STATIC_COLUMNS:
+            setattr(subset, column, getattr(self, column)[indexes])
+        return subset
+
+    def country_code_for(self, country: str) -> int:
+        """Code of a country in this catalog, or -1 if no university is there"""
+        return self.country_codes.get(country.lower(), -1)
+
+
+class StudentColumns:
+    """
+    A cohort of students as (S, 1) column vectors
+    Passing this instead of a single student makes every scoring function
+    below return an (S, N) students x universities matrix.
+    """
+
+    def __init__(self, students: Sequence):
+        count = len(students)
+        self.cgpa = np.fromiter((s.cgpa for s in students), dtype=np.float64, count=count)[:, None]
+        self.ielts = np.fromiter((s.ielts for s in students), dtype=np.float64, count=count)[:, None]
+        self.budget = np.fromiter((s.budget for s in students), dtype=np.float64, count=count)[:, None]
+        self.countries = [s.country for s in students]
+
+    def __len__(self) -> int:
+        return len(self.countries)
+
+
+def _student_country_code(student, cols: UniversityColumns):
+    if isinstance(student, StudentColumns):
+        return np.fromiter(
+            (cols.country_code_for(c) for c in student.countries), dtype=np.int32, count=len(student)
+        )[:, None]
+    return cols.country_code_for(student.country)
+
+
+def calculate_roi_scores(cols: UniversityColumns) -> np.ndarray:
+    """Vectorized calculate_roi_score"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        raw_roi = (cols.avg_salary * cols.employment_rate) / cols.tuition
+        normalized_roi = round_like_python(np.minimum(100.0, (raw_roi / 50.0) * 100.0), 2)
+    return np.where(cols.tuition == 0, 100.0, normalized_roi)
+
+
+def calculate_match_scores(student, cols: UniversityColumns) -> np.ndarray:
+    """Vectorized calculate_match_score"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ielts_score = np.where(
+            student.ielts >= cols.ielts_requirement,
+            1.0,
+            np.maximum(0.0, student.ielts / cols.ielts_requirement),
+        )
+        budget_score = np.where(
+            student.budget >= cols.tuition,
+            1.0,
+            np.maximum(0.0, (student.budget / cols.tuition) / 1.2),
+        )
+    country_score = np.where(cols.country_code == _student_country_code(student, cols), 1.0, 0.0)
+
+    score = ielts_score * 0.4
+    score = score + budget_score * 0.3
+    score = score + country_score * 0.3
+    return round_like_python(score, 3)
+
+
+def calculate_acceptance_probabilities(student, cols: UniversityColumns) -> np.ndarray:
+    """Vectorized calculate_acceptance_probability"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cgpa_ratio = np.where(cols.cgpa_requirement > 0, student.cgpa / cols.cgpa_requirement, 1.0)
+        ielts_ratio = np.where(cols.ielts_requirement > 0, student.ielts / cols.ielts_requirement, 1.0)
+    cgpa_factor = np.minimum(1.2, cgpa_ratio)
+    ielts_factor = np.minimum(1.15, ielts_ratio)
+
+    adjusted_rate = cols.acceptance_rate * cgpa_factor * ielts_factor
+    return round_like_python(np.minimum(100.0, adjusted_rate * 100), 2)
+
+
+def calculate_risk_codes(student, cols: UniversityColumns) -> np.ndarray:
+    """Vectorized calculate_risk_level, as indexes into RISK_LEVELS"""
+    base_risk = cols.risk_index
+    base_risk = base_risk + np.where(student.cgpa < cols.cgpa_requirement, 0.15, 0.0)
+    base_risk = base_risk + np.where(student.ielts < cols.ielts_requirement, 0.10, 0.0)
+    base_risk = base_risk + np.where(student.budget < cols.tuition * 1.2, 0.10, 0.0)
+    return np.where(base_risk < 0.20, 0, np.where(base_risk < 0.35, 1, 2))
+
+
+def top_k_indices(final_score: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indexes of the k best scores, best first, in O(n) with argpartition
+    Equal scores keep catalog order, the same as a stable descending sort.
+    """
+    count = len(final_score)
+    if k <= 0 or count == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < count:
+        candidates = np.argpartition(-final_score, k - 1)[:k]
+        threshold = final_score[candidates].min()
+        # argpartition picks arbitrary members of a tie, so take the earliest ones
+        above = np.flatnonzero(final_score > threshold)
+        tied = np.flatnonzero(final_score == threshold)[:k - len(above)]
+        candidates = np.concatenate([above, tied])
+    else:
+        candidates = np.arange(count)
+    order = np.lexsort((candidates, -final_score[candidates]))
+    return candidates[order]
+
+
+def static_components(cols: UniversityColumns) -> Dict[str, np.ndarray]:
+    """
+    Parts of final_score and ai_confidence that depend only on the university
+    Each term is kept separately (not pre-summed) so adding the per-student
+    terms performs the same float operations as the original expressions.
+    """
+    roi = calculate_roi_scores(cols)
+    employability = cols.employment_rate * 100
+    visa_success = cols.visa_rate * 100
+    return {
+        "roi": roi,
+        "employability": employability,
+        "visa_success": visa_success,
+        "roi_term": 0.4 * (roi / 100.0),
+        "employability_term": 0.2 * (employability / 100.0),
+        "visa_term": 0.1 * (visa_success / 100.0),
+        "roi_confidence": roi * 0.3,
+    }
+
+
+def score_universities(student, cols: UniversityColumns) -> Dict[str, np.ndarray]:
+    """
+    Compute every recommendation metric for all universities at once
+    Produces the same values as the per-row functions in engine.py. Pass a
+    StudentColumns to score a whole cohort; arrays are then (S, N).
+    Only the student-dependent terms are computed here; the rest come from
+    the columns precomputed by static_components().
+    """
+    match = calculate_match_scores(student, cols)
+    acceptance = calculate_acceptance_probabilities(student, cols)
+    risk_code = calculate_risk_codes(student, cols)
+
+    confidence = cols.roi_confidence + match * 100 * 0.3 + acceptance * 0.4
+    ai_confidence = round_like_python(np.minimum(100.0, confidence), 2)
+
+    final_score = (
+        cols.roi_term +
+        0.3 * (acceptance / 100.0) +
+        cols.employability_term +
+        cols.visa_term
+    )
+
+    return {
+        "roi": cols.roi,
+        "match": match,
+        "acceptance": acceptance,
+        "employability": cols.employability,
+        "visa_success": cols.visa_success,
+        "risk_code": risk_code,
+        "ai_confidence": ai_confidence,
+        "final_score": final_score,
+    }
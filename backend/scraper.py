@@ -4,31 +4,202 @@ Scrapes university information from various sources
 """
 import requests
 from bs4 import BeautifulSoup
-from typing import Dict, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+import threading
 import time
+from datetime import datetime, timezone
 import random
 from data import STATIC_UNIVERSITIES
+from scraper.fingerprints import conditional_headers, make_fingerprint
+
+# Typed fields read from data-field="..." elements of a university page
+PAGE_FIELDS = {
+    "name": str,
+    "country": str,
+    "program": str,
+    "avg_salary": float,
+    "tuition": float,
+    "visa_rate": float,
+    "acceptance_rate": float,
+    "employment_rate": float,
+    "risk_index": float,
+    "ielts_requirement": float,
+    "cgpa_requirement": float,
+    "ranking": int,
+    "scholarship_available": lambda value: value.strip().lower() in ("true", "yes", "1"),
+}
+
+# Returned for pages whose content has not changed since the last scrape
+UNCHANGED = object()
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` requests per second, bursts up to `capacity`
+    """
+    
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+def interleave_by_host(targets: List[Tuple]) -> List[int]:
+    """
+    Indexes of targets in round-robin order across their URL hosts
+    Each host's targets keep their input order; targets without a URL form
+    one more group.
+    """
+    queues: Dict[str, deque] = {}
+    for i, target in enumerate(targets):
+        host = urlsplit(target[2]).netloc if len(target) > 2 and target[2] else ""
+        queues.setdefault(host, deque()).append(i)
+    order = []
+    while queues:
+        for host in list(queues):
+            order.append(queues[host].popleft())
+            if not queues[host]:
+                del queues[host]
+    return order
+
+def parse_university_page(html: str) -> Dict:
+    """
+    Extract university fields from a page
+    Fields are read from elements carrying a data-field attribute, e.g.
+    <span data-field="tuition">32000</span>; unknown or malformed values are skipped.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    data = {}
+    for element in soup.select("[data-field]"):
+        field = element["data-field"]
+        if field not in PAGE_FIELDS:
+            continue
+        try:
+            data[field] = PAGE_FIELDS[field](element.get_text(strip=True))
+        except ValueError:
+            continue
+    return data
 
 class UniversityScraper:
     """
     Scraper for university data from web sources
+    Requests are rate limited per host (token bucket), so a pool of workers
+    scales with the number of distinct hosts rather than one global rate.
     """
     
-    def __init__(self):
+    def __init__(self, requests_per_second: float = 1.0, burst: int = 1, max_workers: int = 8,
+                 max_retries: int = 3, backoff_base: float = 0.5, timeout: float = 10.0):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._buckets_lock = threading.Lock()
+        # requests.Session is not thread-safe, so each worker thread gets its own
+        self._local = threading.local()
+        # url -> {"etag", "last_modified", "content_hash"} of the last fetch
+        self.fingerprints: Dict[str, Dict] = {}
+        self._fingerprints_lock = threading.Lock()
     
-    def scrape_university_info(self, university_name: str, country: str) -> Optional[Dict]:
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+    
+    def _bucket_for(self, url: str) -> TokenBucket:
+        host = urlsplit(url).netloc
+        with self._buckets_lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.requests_per_second, self.burst)
+            return bucket
+    
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: spreads retries from many workers instead of synchronizing them
+        return random.uniform(0, self.backoff_base * (2 ** attempt))
+    
+    def fetch(self, url: str, headers: Optional[Dict] = None) -> requests.Response:
+        """
+        GET a URL under its host's rate limit, retrying transient failures
+        with jittered exponential backoff
+        """
+        bucket = self._bucket_for(url)
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response
+            time.sleep(self._backoff(attempt))
+    
+    def fetch_if_changed(self, url: str) -> Optional[requests.Response]:
+        """
+        Conditional GET against the URL's stored fingerprint
+        Returns None if the server answers 304 or the body hash is unchanged,
+        otherwise the response; the fingerprint is updated either way.
+        """
+        with self._fingerprints_lock:
+            previous = self.fingerprints.get(url)
+        response = self.fetch(url, headers=conditional_headers(previous))
+        if response.status_code == 304:
+            return None
+        fingerprint = make_fingerprint(response.headers, response.content)
+        with self._fingerprints_lock:
+            self.fingerprints[url] = fingerprint
+        if previous and previous.get("content_hash") == fingerprint["content_hash"]:
+            return None
+        return response
+    
+    def scrape_university_info(self, university_name: str, country: str, url: Optional[str] = None):
         """
         Scrape university information
-        Returns dictionary with university data or None if scraping fails
+        Returns dictionary with university data, UNCHANGED if the page is the
+        same as at the last scrape, or None if scraping fails
         """
         try:
-            # Rate limiting
-            time.sleep(random.uniform(1, 2))
+            if url:
+                response = self.fetch_if_changed(url)
+                if response is None:
+                    return UNCHANGED
+                # Page values override the known static values for the university
+                base = self._simulate_scraping(university_name, country) or {}
+                scraped = parse_university_page(response.text)
+                return dict(base, name=university_name, country=country, **{
+                    k: v for k, v in scraped.items() if k not in ("name", "country")
+                })
             
             # Example: Scrape from QS Rankings or university websites
             # This is a template - actual implementation would target specific sources
@@ -46,6 +217,19 @@ class UniversityScraper:
             print(f"Error scraping {university_name}: {e}")
             return None
     
+    def scrape_many(self, targets: Iterable[Tuple]) -> List[Tuple[Tuple, Optional[Dict]]]:
+        """
+        Scrape (name, country) or (name, country, url) targets concurrently
+        Targets are dispatched round-robin across hosts, so workers are not all
+        waiting on one host's rate limit while another host sits idle.
+        Returns (target, data) pairs in input order.
+        """
+        targets = list(targets)
+        order = interleave_by_host(targets)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = dict(zip(order, pool.map(lambda i: self.scrape_university_info(*targets[i]), order)))
+        return [(target, results[i]) for i, target in enumerate(targets)]
+    
     def _simulate_scraping(self, university_name: str, country: str) -> Optional[Dict]:
         """
         Simulate scraping by finding matching static data
@@ -104,38 +288,125 @@ class UniversityScraper:
         # 3. Extract employment rates
         return None
 
-def update_university_database(db, scraper: UniversityScraper):
+def load_fingerprints(db, urls: Iterable[str]) -> Dict[str, Dict]:
+    """Stored fingerprints for the given URLs, in one query"""
+    from models import ScrapeSource
+    
+    urls = list(urls)
+    if not urls:
+        return {}
+    return {
+        source.url: {"etag": source.etag, "last_modified": source.last_modified, "content_hash": source.content_hash}
+        for source in db.query(ScrapeSource).filter(ScrapeSource.url.in_(urls))
+    }
+
+def save_fingerprints(db, fingerprints: Dict[str, Dict]):
+    """Upsert fingerprints (caller commits)"""
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+    from models import ScrapeSource
+    
+    if not fingerprints:
+        return
+    statement = sqlite_insert(ScrapeSource)
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=["url"],
+            set_={
+                "etag": statement.excluded.etag,
+                "last_modified": statement.excluded.last_modified,
+                "content_hash": statement.excluded.content_hash,
+                "updated_at": statement.excluded.updated_at,
+            }
+        ),
+        [dict(fingerprint, url=url, updated_at=datetime.now(timezone.utc)) for url, fingerprint in fingerprints.items()]
+    )
+
+def update_university_database(db, scraper: UniversityScraper,
+                               targets: Optional[Iterable[Tuple]] = None, batch_size: int = 100,
+                               incremental: bool = True) -> Dict[str, int]:
     """
     Update university database with scraped data
+    Targets are scraped concurrently; existing rows are loaded in one query
+    and changes are committed in batches. With incremental=True, pages are
+    fetched conditionally against their stored fingerprints and unchanged
+    pages are not parsed. Only rows whose values differ are written.
+    Returns counts of created, updated, unchanged, skipped and failed targets.
     """
     from models import University
-    from data import get_university_by_name
+    from catalog import bump_generation, catalog
     
     # List of universities to scrape
-    universities_to_scrape = [
+    universities_to_scrape = list(targets) if targets is not None else [
         ("University of Toronto", "Canada"),
         ("Technical University of Munich", "Germany"),
         # Add more as needed
     ]
     
-    for name, country in universities_to_scrape:
-        existing = get_university_by_name(name, db)
-        if existing:
-            # Update existing record
-            scraped_data = scraper.scrape_university_info(name, country)
-            if scraped_data:
-                # Update fields
-                existing.tuition = scraped_data.get("tuition", existing.tuition)
-                existing.ranking = scraped_data.get("ranking", existing.ranking)
-                # ... update other fields
-                db.commit()
+    urls = [target[2] for target in universities_to_scrape if len(target) > 2 and target[2]]
+    # The stored fingerprints are the baseline (none for a full refresh)
+    for url in urls:
+        scraper.fingerprints.pop(url, None)
+    if incremental:
+        scraper.fingerprints.update(load_fingerprints(db, urls))
+    known = {url: scraper.fingerprints.get(url) for url in urls}
+    
+    names = [target[0] for target in universities_to_scrape]
+    existing = {
+        university.name: university
+        for university in db.query(University).filter(University.name.in_(names))
+    }
+    columns = set(University.__table__.columns.keys()) - {"id", "created_at", "updated_at"}
+    
+    counts = {"created": 0, "updated": 0, "unchanged": 0, "skipped": 0, "failed": 0}
+    pending = 0
+    for (name, country, *_), scraped_data in scraper.scrape_many(universities_to_scrape):
+        if scraped_data is UNCHANGED:
+            counts["unchanged"] += 1
+            continue
+        if not scraped_data:
+            counts["failed"] += 1
+            continue
+        fields = {key: value for key, value in scraped_data.items() if key in columns}
+        university = existing.get(name)
+        if university:
+            # Update existing record, touching only the fields that changed
+            changed = {key: value for key, value in fields.items() if getattr(university, key) != value}
+            if not changed:
+                counts["unchanged"] += 1
+                continue
+            for key, value in changed.items():
+                setattr(university, key, value)
+            counts["updated"] += 1
         else:
-            # Create new record
-            scraped_data = scraper.scrape_university_info(name, country)
-            if scraped_data:
-                university = University(**scraped_data)
-                db.add(university)
-                db.commit()
+            # Create new record (only if the scrape produced every required field)
+            missing = [column for column in columns if column not in fields and column != "scholarship_available"]
+            if missing:
+                print(f"Skipping {name}: missing {', '.join(sorted(missing))}")
+                counts["skipped"] += 1
+                continue
+            university = University(**fields)
+            db.add(university)
+            existing[name] = university
+            counts["created"] += 1
+        pending += 1
+        if pending >= batch_size:
+            bump_generation(db)
+            db.commit()
+            pending = 0
+    
+    save_fingerprints(db, {
+        url: scraper.fingerprints[url]
+        for url in urls
+        if url in scraper.fingerprints and scraper.fingerprints[url] != known.get(url)
+    })
+    if pending:
+        bump_generation(db)
+    db.commit()
+    
+    # Scoring reads the in-memory catalog, so drop it after any update
+    if counts["created"] or counts["updated"]:
+        catalog.invalidate(db)
+    return counts
 
 if __name__ == "__main__":
     # Example usage
@@ -1,9 +1,10 @@
 """
 Scraper package for university data collection
 """
-from .university_scraper import scrape_universities
+from .browser_pool import BrowserPool, browser_pool
+from .university_scraper import scrape_pages, scrape_universities
 
-__all__ = ['scrape_universities']
+__all__ = ['BrowserPool', 'browser_pool', 'scrape_pages', 'scrape_universities']
 
 
 
@@ -0,0 +1,93 @@
+"""
+Long-lived Playwright browser shared by scrapes
+One Chromium process and context are started on first use and reused; a fixed
+set of pages is handed out through a queue, so concurrent scrapes run in
+parallel up to the pool size without relaunching the browser.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional, Sequence
+
+from playwright.async_api import async_playwright
+
+# Resource types that are never needed to read card text
+BLOCKED_RESOURCE_TYPES = ("image", "font", "media")
+
+
+class BrowserPool:
+    """
+    Pool of pages in one shared browser context
+    Requests for blocked resource types are aborted by a context-wide route.
+    """
+
+    def __init__(self, size: int = 4, headless: bool = True,
+                 blocked_resource_types: Sequence[str] = BLOCKED_RESOURCE_TYPES):
+        self.size = size
+        self.headless = headless
+        self.blocked_resource_types = frozenset(blocked_resource_types)
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._pages: Optional[asyncio.Queue] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def started(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    async def start(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.started:
+                return
+            # A crashed browser is torn down and replaced
+            await self._shutdown()
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=self.headless)
+            self._context = await self._browser.new_context()
+            if self.blocked_resource_types:
+                await self._context.route("**/*", self._route)
+            self._pages = asyncio.Queue()
+            for _ in range(self.size):
+                self._pages.put_nowait(await self._context.new_page())
+
+    async def _route(self, route):
+        if route.request.resource_type in self.blocked_resource_types:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    @asynccontextmanager
+    async def page(self):
+        """Borrow a page, waiting while all pages are in use"""
+        if not self.started:
+            await self.start()
+        pages = self._pages
+        page = await pages.get()
+        try:
+            yield page
+        finally:
+            if page.is_closed() and self.started:
+                page = await self._context.new_page()
+            pages.put_nowait(page)
+
+    async def close(self):
+        if self._lock is None:
+            return
+        async with self._lock:
+            await self._shutdown()
+
+    async def _shutdown(self):
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception as e:
+                print(f"Error closing browser: {e}")
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._playwright = self._browser = self._context = self._pages = None
+
+
+# Shared by /scrape calls; closed on application shutdown
+browser_pool = BrowserPool()
@@ -0,0 +1,34 @@
+"""
+Content fingerprints for incremental scraping
+A source URL's fingerprint is its last ETag, Last-Modified and body hash.
+The validators go back to the server as a conditional request (answered with
+304 when nothing changed); the hash catches unchanged pages from servers
+that send neither.
+"""
+import hashlib
+from typing import Mapping, Optional
+
+
+def content_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+def conditional_headers(fingerprint: Optional[Mapping]) -> dict:
+    """If-None-Match / If-Modified-Since headers for a stored fingerprint"""
+    headers = {}
+    if fingerprint:
+        if fingerprint.get("etag"):
+            headers["If-None-Match"] = fingerprint["etag"]
+        if fingerprint.get("last_modified"):
+            headers["If-Modified-Since"] = fingerprint["last_modified"]
+    return headers
+
+
+def make_fingerprint(headers: Mapping, body: bytes) -> dict:
+    """Fingerprint of a fetched page from its response headers and body"""
+    lowered = {name.lower(): value for name, value in headers.items()}
+    return {
+        "etag": lowered.get("etag"),
+        "last_modified": lowered.get("last-modified"),
+        "content_hash": content_hash(body),
+    }
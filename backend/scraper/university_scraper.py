@@ -1,39 +1,189 @@
 import asyncio
-from playwright.async_api import async_playwright
-from mongodb import mongo_db
+import os
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
 
+from pymongo import UpdateOne
 
-async def scrape_universities():
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
+from scraper.browser_pool import BrowserPool, browser_pool
+from scraper.fingerprints import conditional_headers, make_fingerprint
 
-        # 🔥 REPLACE THIS WITH REAL WEBSITE URL
-        await page.goto("https://www.kcoverseas.com/", timeout=60000)
+# 🔥 REPLACE THIS WITH REAL WEBSITE URL
+SOURCE_URLS = ["https://www.kcoverseas.com/"]
 
+# Hosts API clients may ask to scrape: the default sources plus EDUINTEL_SCRAPE_ALLOWED_HOSTS (comma separated)
+ALLOWED_HOSTS = {urlsplit(url).hostname for url in SOURCE_URLS} | {
+    host.strip().lower() for host in os.getenv("EDUINTEL_SCRAPE_ALLOWED_HOSTS", "").split(",") if host.strip()
+}
+
+# Example selector (you MUST inspect website and update this)
+CARD_SELECTOR = "div.card"
+
+# Reads every card in the page's JS context: one round trip instead of 3 awaits per card
+EXTRACT_CARDS = """
+(selector) => Array.from(document.querySelectorAll(selector), (card) => {
+    const text = (field) => {
+        const element = card.querySelector(field);
+        return element ? element.innerText : null;
+    };
+    return {name: text("h3"), country: text(".country"), program: text(".program")};
+})
+"""
+
+CARD_FIELDS = ("name", "country", "program")
+
+
+async def _preflight(page, url: str, fingerprint: Optional[dict]) -> Optional[dict]:
+    """
+    Conditional GET through the context's request API (no rendering)
+    Returns the page's new fingerprint, or None if it has not changed.
+    """
+    response = await page.request.get(url, headers=conditional_headers(fingerprint), timeout=60000)
+    try:
+        if response.status == 304:
+            return None
+        new_fingerprint = make_fingerprint(response.headers, await response.body())
+    finally:
+        await response.dispose()
+    if fingerprint and fingerprint.get("content_hash") == new_fingerprint["content_hash"]:
+        return None
+    return new_fingerprint
+
+
+def url_allowed(url: str) -> bool:
+    """
+    Whether an API client may have the server fetch this URL
+    Only http(s) URLs on ALLOWED_HOSTS; direct calls to scrape_pages may still
+    use file:// pages.
+    """
+    try:
+        parts = urlsplit(url)
+        return parts.scheme in ("http", "https") and parts.hostname in ALLOWED_HOSTS and not parts.username
+    except ValueError:
+        return False
+
+
+async def scrape_page(url: str, pool: BrowserPool = browser_pool, selector: str = CARD_SELECTOR,
+                      fingerprints: Optional[Dict[str, dict]] = None) -> Tuple[List[dict], Optional[dict]]:
+    """
+    Cards on one page (http(s):// or file:// URL) and the page's new fingerprint
+    With a fingerprints dict, http(s) pages are checked with a conditional
+    pre-flight first; unchanged pages are not rendered and yield no cards and
+    no fingerprint. The fingerprint is only returned once extraction has
+    succeeded, so a failed render is retried on the next incremental run.
+    """
+    fingerprint = None
+    async with pool.page() as page:
+        if fingerprints is not None and url.startswith(("http://", "https://")):
+            fingerprint = await _preflight(page, url, fingerprints.get(url))
+            if fingerprint is None:
+                return [], None
+        await page.goto(url, timeout=60000)
         await page.wait_for_load_state("networkidle")
+        cards = await page.evaluate(EXTRACT_CARDS, selector)
+    return cards, fingerprint
+
+
+async def scrape_pages(urls: Iterable[str], pool: BrowserPool = browser_pool,
+                       selector: str = CARD_SELECTOR,
+                       progress: Optional[Callable[[int, int], None]] = None,
+                       fingerprints: Optional[Dict[str, dict]] = None) -> List[dict]:
+    """
+    Cards from all URLs, scraped in parallel up to the pool size
+    progress(done, total) is called as each page finishes. Passing a
+    fingerprints dict (url -> fingerprint) enables incremental mode; it is
+    updated in place for pages whose content changed and was extracted.
+    """
+    urls = list(urls)
+    done = 0
+
+    async def scrape_one(url):
+        nonlocal done
+        try:
+            return await scrape_page(url, pool, selector, fingerprints)
+        finally:
+            done += 1
+            if progress:
+                progress(done, len(urls))
+
+    results = await asyncio.gather(*(scrape_one(url) for url in urls), return_exceptions=True)
+    scraped_data = []
+    for url, result in zip(urls, results):
+        if isinstance(result, Exception):
+            print(f"Error scraping {url}: {result}")
+            continue
+        cards, fingerprint = result
+        scraped_data.extend(cards)
+        if fingerprint is not None:
+            fingerprints[url] = fingerprint
+    return scraped_data
+
+
+async def load_fingerprints(collection, urls: List[str]) -> Dict[str, dict]:
+    """Stored fingerprints for the given URLs (documents keyed by URL)"""
+    return {
+        document.pop("_id"): document
+        async for document in collection.find({"_id": {"$in": urls}})
+    }
+
+
+async def save_fingerprints(collection, fingerprints: Dict[str, dict]):
+    if fingerprints:
+        await collection.bulk_write([
+            UpdateOne({"_id": url}, {"$set": fingerprint}, upsert=True)
+            for url, fingerprint in fingerprints.items()
+        ], ordered=False)
+
 
-        # Example selector (you MUST inspect website and update this)
-        university_cards = await page.query_selector_all("div.card")
+async def upsert_cards(collection, cards: List[dict]) -> int:
+    """
+    Upsert cards on (name, country), writing only new or changed ones
+    Returns the number of cards written.
+    """
+    latest = {}
+    for card in cards:
+        if card.get("name"):
+            latest[(card["name"], card.get("country"))] = {field: card.get(field) for field in CARD_FIELDS}
+    if not latest:
+        return 0
 
-        scraped_data = []
+    projection = dict.fromkeys(CARD_FIELDS, 1)
+    projection["_id"] = 0
+    stored = {
+        (document.get("name"), document.get("country")): {field: document.get(field) for field in CARD_FIELDS}
+        async for document in collection.find({"name": {"$in": [name for name, _ in latest]}}, projection)
+    }
+    changed = [card for key, card in latest.items() if stored.get(key) != card]
+    if changed:
+        # updated_at lets the SQL sync poll for changed cards (see sync.py)
+        updated_at = datetime.now(timezone.utc)
+        await collection.bulk_write([
+            UpdateOne({"name": card["name"], "country": card["country"]},
+                      {"$set": dict(card, updated_at=updated_at)}, upsert=True)
+            for card in changed
+        ], ordered=False)
+    return len(changed)
 
-        for card in university_cards:
-            name = await card.query_selector("h3")
-            country = await card.query_selector(".country")
-            program = await card.query_selector(".program")
 
-            university = {
-                "name": await name.inner_text() if name else None,
-                "country": await country.inner_text() if country else None,
-                "program": await program.inner_text() if program else None,
-            }
+async def scrape_universities(urls: Optional[List[str]] = None,
+                              progress: Optional[Callable[[int, int], None]] = None,
+                              incremental: bool = True):
+    # Imported here so scrape_pages() works against local fixtures without a Mongo config
+    from mongodb import mongo_db
 
-            scraped_data.append(university)
+    urls = list(urls or SOURCE_URLS)
+    fingerprints = await load_fingerprints(mongo_db.scrape_sources, urls) if incremental else {}
+    known = dict(fingerprints)
 
-        if scraped_data:
-            await mongo_db.universities.insert_many(scraped_data)
+    scraped_data = await scrape_pages(urls, progress=progress, fingerprints=fingerprints)
+    written = await upsert_cards(mongo_db.universities, scraped_data)
 
-        await browser.close()
+    changed = {url: fingerprint for url, fingerprint in fingerprints.items() if known.get(url) != fingerprint}
+    await save_fingerprints(mongo_db.scrape_sources, changed)
 
-    return {"scraped_count": len(scraped_data)}
+    return {
+        "scraped_count": len(scraped_data),
+        "written_count": written,
+        "changed_pages": len(changed),
+    }
@@ -0,0 +1,37 @@
+"""
+Optional fast JSON serialization for hot endpoints
+
+With EDUINTEL_FAST_JSON=1 (and orjson installed), handlers return their
+payloads as ORJSONResponse. Returning a Response directly also skips
+FastAPI's response_model re-validation and jsonable_encoder pass, which is
+redundant for dicts the engine and listing queries already built.
+"""
+import json
+import os
+from typing import Optional
+
+from fastapi.responses import ORJSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FAST_JSON_ENABLED = os.getenv("EDUINTEL_FAST_JSON", "0") == "1" and orjson is not None
+
+
+def fast_json(content, headers: Optional[dict] = None):
+    """
+    ORJSONResponse for content when fast mode is on, otherwise content unchanged
+    Headers only apply in fast mode; in normal mode set them on the injected Response.
+    """
+    if FAST_JSON_ENABLED:
+        return ORJSONResponse(content, headers=headers)
+    return content
+
+
+def dumps_line(obj) -> bytes:
+    """One NDJSON line, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj) + b"\n"
+    return (json.dumps(obj) + "\n").encode()
@@ -0,0 +1,86 @@
+"""
+Production launcher: several uvicorn workers sharing one mapped catalog
+
+The catalog snapshot in /dev/shm (see catalog.py) is checked once here,
+rebuilt only if it is missing or stale, and then every worker maps that file
+instead of loading the universities table into its own memory. Each worker
+also writes its metrics to a shared directory (EDUINTEL_METRICS_DIR, see
+metrics.py), so /metrics and the stats endpoints cover every worker. run.py
+stays the development server (single process, auto-reload).
+
+    python serve.py --workers 4 --port 8000
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import uvicorn
+
+
+def _shared_directory() -> str:
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+def default_catalog_path(port: int) -> str:
+    return os.path.join(_shared_directory(), f"eduintel-catalog-{port}.bin")
+
+
+def prepare_catalog() -> int:
+    """Create and seed the tables and bring the catalog snapshot up to date; returns its size"""
+    # Imported here: catalog reads EDUINTEL_SHARED_CATALOG at import time
+    from analytics import ensure_summary
+    from catalog import catalog
+    from data import initialize_universities
+    from database import SessionLocal, init_db
+
+    init_db()
+    with SessionLocal() as db:
+        initialize_universities(db)
+        # Done once here so the workers' startup does not race to create it
+        ensure_summary(db)
+        return len(catalog.load(db))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--catalog-path", help="shared catalog snapshot (default /dev/shm/eduintel-catalog-<port>.bin)")
+    args = parser.parse_args()
+
+    # Workers inherit the environment, so they all map the same file
+    catalog_path = args.catalog_path or os.getenv("EDUINTEL_SHARED_CATALOG") or default_catalog_path(args.port)
+    os.environ["EDUINTEL_SHARED_CATALOG"] = catalog_path
+
+    # In a child process, so the supervisor does not keep the build's memory
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        count = pool.submit(prepare_catalog).result()
+    print(f"Catalog of {count} universities at {catalog_path}")
+
+    # Fresh per launch, so counters start from zero like a single process's
+    metrics_dir = os.getenv("EDUINTEL_METRICS_DIR")
+    created = not metrics_dir
+    if created:
+        metrics_dir = tempfile.mkdtemp(prefix=f"eduintel-metrics-{args.port}-", dir=_shared_directory())
+        os.environ["EDUINTEL_METRICS_DIR"] = metrics_dir
+
+    try:
+        uvicorn.run(
+            "main:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            log_level=args.log_level
+        )
+    finally:
+        if created:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Mongo -> SQL sync for scraped universities
+Scrapes land in mongo_db.universities, but scoring reads the SQL catalog.
+MongoSync streams new and changed documents into the universities table in
+batches: from a change stream when the server supports one (replica set),
+otherwise by polling a keyset cursor on (updated_at, _id). Documents are
+normalized, deduplicated on name (the table's unique key), and written in one
+transaction per batch. New universities wait until a document has every
+numeric field; nothing is imputed. The resume position is stored in
+sync_checkpoints, in the same transaction as the batch.
+
+Deleting a Mongo document does not delete the SQL row.
+
+Run one catch-up pass:
+    python sync.py once
+"""
+import asyncio
+import os
+import re
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bson import json_util
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from catalog import bump_generation, catalog
+from data import UNIVERSITY_FIELDS
+from models import SyncCheckpoint, University
+
+# Enable the background sync in the API with EDUINTEL_MONGO_SYNC=1
+MONGO_SYNC_ENABLED = os.getenv("EDUINTEL_MONGO_SYNC", "0") == "1"
+
+# Seconds between polls when there is no change stream (and between idle change-stream checks)
+SYNC_POLL_INTERVAL = float(os.getenv("EDUINTEL_MONGO_SYNC_INTERVAL", "5"))
+
+CHECKPOINT_NAME = "mongo_universities"
+
+TEXT_FIELDS = ("name", "country", "program")
+NUMERIC_FIELDS = tuple(field for field in UNIVERSITY_FIELDS if field not in TEXT_FIELDS + ("scholarship_available",))
+
+DEFAULT_PROGRAM = "General"
+
+
+def _clean_text(value) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    return re.sub(r"\s+", " ", value).strip() or None
+
+
+def normalize_document(document: Dict) -> Optional[Tuple[Dict, frozenset]]:
+    """
+    (row, provided fields) for a Mongo document, or None without a name and country
+    Numeric fields the document does not have are None; nothing is imputed.
+    """
+    row = {field: _clean_text(document.get(field)) for field in TEXT_FIELDS}
+    if not row["name"] or not row["country"]:
+        return None
+    provided = {field for field in TEXT_FIELDS if row[field]}
+    row["program"] = row["program"] or DEFAULT_PROGRAM
+
+    for field in NUMERIC_FIELDS:
+        try:
+            value = float(document[field])
+        except (KeyError, TypeError, ValueError):
+            row[field] = None
+            continue
+        row[field] = int(value) if field == "ranking" else value
+        provided.add(field)
+
+    if "scholarship_available" in document:
+        row["scholarship_available"] = bool(document["scholarship_available"])
+        provided.add("scholarship_available")
+    else:
+        row["scholarship_available"] = False
+    return row, frozenset(provided)
+
+
+def dedupe_documents(documents: Iterable[Dict]) -> List[Tuple[Dict, frozenset]]:
+    """
+    Normalized rows, one per name; the last document wins
+    Keyed on name alone, the same identity as the universities table's
+    unique constraint, so two documents never target one row.
+    """
+    latest = {}
+    for document in documents:
+        normalized = normalize_document(document)
+        if normalized:
+            latest[normalized[0]["name"]] = normalized
+    return list(latest.values())
+
+
+def _update_statement(fields: Iterable[str]):
+    return update(University).where(University.name == bindparam("match_name")).values(
+        dict({field: bindparam(field) for field in fields}, updated_at=func.now())
+    )
+
+
+def write_documents(db, documents: Iterable[Dict], position: Optional[Dict] = None) -> int:
+    """
+    Write a batch of Mongo documents into the universities table
+    - Existing rows are only updated in the fields the documents provided.
+    - A document whose name belongs to a university in another country is
+      skipped and logged rather than overwriting it.
+    - New universities are only inserted once every numeric field is known,
+      so rows without real scoring data never reach the catalog; a later
+      update of the document brings them in.
+    The batch (and the checkpoint position, if given) is one transaction with
+    one catalog invalidation. Returns rows written.
+    """
+    rows = dedupe_documents(documents)
+    names = [row["name"] for row, _ in rows]
+    existing = dict(db.query(University.name, University.country).filter(University.name.in_(names)))
+
+    inserts: List[Dict] = []
+    updates: Dict[frozenset, List[Dict]] = {}
+    incomplete = 0
+    for row, provided in rows:
+        country = existing.get(row["name"])
+        if country is None:
+            if provided.issuperset(NUMERIC_FIELDS):
+                inserts.append(row)
+            else:
+                incomplete += 1
+        elif country.casefold() != row["country"].casefold():
+            print(f"Sync skipped {row['name']!r} in {row['country']}: name already used by a university in {country}")
+        else:
+            fields = provided - {"name", "country"}
+            updates.setdefault(fields, []).append(dict({field: row[field] for field in fields}, match_name=row["name"]))
+    if incomplete:
+        print(f"Sync held back {incomplete} new universities with missing numeric fields")
+
+    # Core execution on the session's connection: ORM bulk mode would not report rowcount
+    connection = db.connection()
+    written = 0
+    if inserts:
+        statement = sqlite_insert(University).on_conflict_do_nothing(index_elements=["name"])
+        written += connection.execute(statement, inserts).rowcount
+    for fields, params in updates.items():
+        written += connection.execute(_update_statement(fields), params).rowcount
+    if written:
+        # Same transaction as the rows, so catalog snapshots can tell they are stale
+        bump_generation(db)
+    if position is not None:
+        save_checkpoint(db, position)
+    db.commit()
+    if written:
+        catalog.invalidate(db)
+    return written
+
+
+def load_checkpoint(db) -> Optional[Dict]:
+    checkpoint = db.get(SyncCheckpoint, CHECKPOINT_NAME)
+    return json_util.loads(checkpoint.position) if checkpoint else None
+
+
+def save_checkpoint(db, position: Dict):
+    """Store the resume position in the caller's transaction"""
+    checkpoint = db.get(SyncCheckpoint, CHECKPOINT_NAME) or SyncCheckpoint(name=CHECKPOINT_NAME)
+    checkpoint.position = json_util.dumps(position)
+    db.add(checkpoint)
+
+
+def _after(updated_at, last_id) -> Dict:
+    """Mongo filter for documents after (updated_at, _id) in keyset order"""
+    if updated_at is None:
+        # Documents without updated_at (e.g. written by insert_many) sort first, by _id
+        after_id = {"updated_at": None} if last_id is None else {"updated_at": None, "_id": {"$gt": last_id}}
+        return {"$or": [after_id, {"updated_at": {"$ne": None}}]}
+    return {"$or": [
+        {"updated_at": {"$gt": updated_at}},
+        {"updated_at": updated_at, "_id": {"$gt": last_id}},
+    ]}
+
+
+class MongoSync:
+    """
+    Streams a Mongo collection into the SQL universities table
+    SQL writes run on a worker thread with their own session per batch.
+    """
+
+    def __init__(self, collection, session_factory, batch_size: int = 500,
+                 poll_interval: float = SYNC_POLL_INTERVAL):
+        self.collection = collection
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.mode: Optional[str] = None
+        self.documents_read = 0
+        self.rows_written = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def _write(self, documents: List[Dict], position: Dict) -> int:
+        db = self.session_factory()
+        try:
+            return write_documents(db, documents, position)
+        finally:
+            db.close()
+
+    def _checkpoint(self) -> Dict:
+        db = self.session_factory()
+        try:
+            return load_checkpoint(db) or {}
+        finally:
+            db.close()
+
+    async def _flush(self, documents: List[Dict], position: Dict):
+        written = await asyncio.to_thread(self._write, documents, position)
+        self.documents_read += len(documents)
+        self.rows_written += written
+
+    async def poll_once(self) -> int:
+        """Sync every document after the stored cursor; returns documents read"""
+        position = await asyncio.to_thread(self._checkpoint)
+        updated_at, last_id = position.get("updated_at"), position.get("last_id")
+        read = 0
+        while True:
+            batch = await self.collection.find(_after(updated_at, last_id)).sort(
+                [("updated_at", 1), ("_id", 1)]
+            ).to_list(self.batch_size)
+            if not batch:
+                return read
+            updated_at, last_id = batch[-1].get("updated_at"), batch[-1]["_id"]
+            await self._flush(batch, dict(position, updated_at=updated_at, last_id=last_id))
+            read += len(batch)
+
+    async def _stream_changes(self):
+        """Open the change stream, catch up by polling, then apply changes as they arrive"""
+        position = await asyncio.to_thread(self._checkpoint)
+        options = {"full_document": "updateLookup"}
+        if position.get("resume_token"):
+            options["resume_after"] = position["resume_token"]
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+        async with self.collection.watch(pipeline, **options) as stream:
+            # The first read opens the stream, so nothing written during the catch-up is missed
+            pending = [await stream.try_next()]
+            await self.poll_once()
+            position = await asyncio.to_thread(self._checkpoint)
+            self.mode = "change_stream"
+            while True:
+                batch = [change["fullDocument"] for change in pending if change and change.get("fullDocument")]
+                pending = []
+                while len(batch) < self.batch_size:
+                    change = await stream.try_next()
+                    if change is None:
+                        break
+                    if change.get("fullDocument"):
+                        batch.append(change["fullDocument"])
+                if stream.resume_token is not None:
+                    position = dict(position, resume_token=stream.resume_token)
+                if batch:
+                    await self._flush(batch, position)
+                else:
+                    await asyncio.sleep(self.poll_interval)
+
+    async def run(self):
+        """Follow the change stream, or poll if it cannot be opened or fails"""
+        while True:
+            try:
+                try:
+                    await self._stream_changes()
+                except Exception as e:
+                    # Standalone servers (and mongomock) have no change streams
+                    print(f"Mongo change stream unavailable ({e}); polling every {self.poll_interval}s")
+                self.mode = "polling"
+                while True:
+                    await self.poll_once()
+                    await asyncio.sleep(self.poll_interval)
+            except Exception as e:
+                print(f"Mongo sync error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self._task is not None,
+            "mode": self.mode,
+            "documents_read": self.documents_read,
+            "rows_written": self.rows_written,
+        }
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, init_db
+    from mongodb import mongo_db
+
+    if sys.argv[1:] != ["once"]:
+        print("Usage: python sync.py once")
+        sys.exit(1)
+
+    init_db()
+    sync = MongoSync(mongo_db.universities, SessionLocal)
+    read = asyncio.run(sync.poll_once())
+    print(f"Synced {read} documents ({sync.rows_written} rows written)")
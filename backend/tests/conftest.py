@@ -0,0 +1,22 @@
+import os
+import sys
+
+# Tests import the backend modules directly, with the catalog kept on the heap
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["EDUINTEL_CATALOG_SNAPSHOT"] = ""
+os.environ.pop("EDUINTEL_SHARED_CATALOG", None)
+
+import pytest  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from database import create_storage_engine  # noqa: E402
+from models import Base  # noqa: E402
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Sessions on a fresh temporary database with every table created"""
+    engine = create_storage_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    engine.dispose()
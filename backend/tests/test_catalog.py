@@ -0,0 +1,20 @@
+from catalog import UniversityCatalog
+from data import STATIC_UNIVERSITIES, upsert_universities
+
+
+def test_version_follows_another_workers_republish(session_factory, tmp_path):
+    # Two workers mapping one snapshot file
+    path = str(tmp_path / "catalog.snapshot")
+    writer, reader = UniversityCatalog(path), UniversityCatalog(path)
+    with session_factory() as db:
+        upsert_universities(db, STATIC_UNIVERSITIES)
+        writer.load(db)
+        reader.load(db)
+        version = reader.current_version()
+
+        upsert_universities(db, [dict(STATIC_UNIVERSITIES[0], tuition=1.0)])
+        writer.invalidate(db)
+
+    # A cache lookup keyed on the version must see the change without a reload
+    assert reader.current_version() > version
+    assert min(record.tuition for record in reader.records) == 1.0
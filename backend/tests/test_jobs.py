@@ -0,0 +1,57 @@
+import asyncio
+
+from jobs import JobScheduler
+
+
+def test_jobs_are_shared_between_schedulers(session_factory):
+    """Two schedulers on one database stand in for two workers"""
+    release = None
+
+    async def runner(params, progress):
+        progress(1, 2)
+        await release.wait()
+        progress(2, 2)
+        return {"pages": 2}
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        first = JobScheduler(runner, session_factory)
+        second = JobScheduler(runner, session_factory)
+
+        job = await first.submit({"urls": ["https://example.edu"]})
+        await asyncio.sleep(0.1)
+        # Identical job submitted to the other worker joins the running one
+        joined = await second.submit({"urls": ["https://example.edu"]})
+        assert joined.id == job.id
+        seen = await second.get(job.id)
+        assert (seen.status, seen.done, seen.total) == ("running", 1, 2)
+
+        release.set()
+        await first.wait(job)
+        finished = await second.get(job.id)
+        assert (finished.status, finished.result, finished.done) == ("succeeded", {"pages": 2}, 2)
+        assert [j.id for j in await second.jobs()] == [job.id]
+
+        # Finished jobs no longer block a new identical job
+        again = await second.submit({"urls": ["https://example.edu"]})
+        assert again.id != job.id
+        await second.wait(again)
+        await first.close()
+        await second.close()
+
+    asyncio.run(scenario())
+
+
+def test_failed_job_records_error(session_factory):
+    async def runner(params, progress):
+        raise RuntimeError("browser crashed")
+
+    async def scenario():
+        scheduler = JobScheduler(runner, session_factory)
+        job = await scheduler.wait(await scheduler.submit())
+        assert (job.status, job.error) == ("failed", "browser crashed")
+        stored = await JobScheduler(runner, session_factory).get(job.id)
+        assert (stored.status, stored.error) == ("failed", "browser crashed")
+
+    asyncio.run(scenario())
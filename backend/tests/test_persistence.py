@@ -0,0 +1,51 @@
+from datetime import datetime
+
+from models import AnalyticsRollup, Recommendation, Student
+from persistence import WriteBehindQueue
+
+
+def student_row(name):
+    return {"name": name, "cgpa": 8.0, "ielts": 7.0, "budget": 30000, "country": "Canada",
+            "field": "Computer Science", "career_goal": "Engineer"}
+
+
+def recommendation_row(university_id):
+    return {"university_id": university_id, "roi_score": 50.0, "acceptance_probability": 40.0,
+            "employability": 90.0, "visa_success": 80.0, "ai_confidence": 70.0, "risk_level": "Low"}
+
+
+def test_failed_batch_keeps_good_rows(session_factory, capsys):
+    queue = WriteBehindQueue(session_factory)
+    queue.start()
+    queue.submit(student_row("Good 1"), [recommendation_row(1)])
+    # NOT NULL violation: fails the batch insert, and then only this job
+    queue.submit(dict(student_row("Bad"), name=None), [recommendation_row(2)])
+    queue.submit(student_row("Good 2"), [recommendation_row(3)])
+    queue.close()
+
+    stats = queue.stats()
+    assert (stats["failed_batches"], stats["dropped_students"]) == (1, 1)
+    assert (stats["students_written"], stats["recommendations_written"]) == (2, 2)
+    with session_factory() as db:
+        assert sorted(name for (name,) in db.query(Student.name)) == ["Good 1", "Good 2"]
+        assert sorted(uid for (uid,) in db.query(Recommendation.university_id)) == [1, 3]
+    assert "university ids [2]" in capsys.readouterr().out
+
+
+def test_rows_and_rollups_keep_the_request_time(session_factory):
+    # Served at 09:58, flushed much later: buckets must follow the request
+    served = datetime(2024, 1, 1, 9, 58, 30)
+    queue = WriteBehindQueue(session_factory)
+    queue.start()
+    queue.submit(dict(student_row("Early"), created_at=served), [dict(recommendation_row(1), created_at=served)])
+    queue.close()
+
+    with session_factory() as db:
+        assert db.query(Student.created_at).scalar() == served
+        assert db.query(Recommendation.created_at).scalar() == served
+        buckets = {bucket: start for bucket, start in db.query(AnalyticsRollup.bucket, AnalyticsRollup.bucket_start)}
+    assert buckets == {
+        "minute": datetime(2024, 1, 1, 9, 58),
+        "hour": datetime(2024, 1, 1, 9),
+        "day": datetime(2024, 1, 1),
+    }
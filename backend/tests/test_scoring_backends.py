@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+import engine
+from catalog import RECORD_FIELDS, UniversityRecord
+from catalog_index import CatalogIndex
+from data import STATIC_UNIVERSITIES
+from engine import _score_numpy, _score_numpy_batch, _score_python
+from models import Student
+from scoring import UniversityColumns
+
+METRICS = ("roi", "match", "acceptance", "employability", "visa_success", "risk_level", "ai_confidence", "final_score")
+
+PROGRAMS = ["Computer Science", "Data Science", "Business Analytics", "Mechanical Engineering"]
+
+
+def synthetic_catalog(count: int, seed: int) -> UniversityColumns:
+    """Random rows around the seed data, with every third row duplicated so scores tie"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        if i % 3 == 2:
+            row = dict(rows[-1], id=i + 1, name=f"{rows[-1]['name']} (copy)")
+        else:
+            row = dict(rng.choice(STATIC_UNIVERSITIES), id=i + 1, name=f"University {i + 1}")
+            row["program"] = rng.choice(PROGRAMS)
+            row["avg_salary"] = float(rng.randrange(20000, 150000, 500))
+            # A few free programs exercise the tuition == 0 ROI branch
+            row["tuition"] = 0.0 if rng.random() < 0.05 else float(rng.randrange(1000, 60000, 500))
+            for key in ("visa_rate", "acceptance_rate", "employment_rate", "risk_index"):
+                row[key] = round(rng.uniform(0.05, 0.95), 2)
+            row["ielts_requirement"] = rng.choice([6.0, 6.5, 7.0, 7.5])
+            row["cgpa_requirement"] = rng.choice([7.0, 7.5, 8.0, 8.5, 9.0])
+            row["ranking"] = rng.randint(1, 500)
+        rows.append(row)
+    return UniversityColumns([UniversityRecord(*(row[field] for field in RECORD_FIELDS)) for row in rows])
+
+
+def synthetic_students(count: int, seed: int):
+    rng = random.Random(seed)
+    countries = sorted({u["country"] for u in STATIC_UNIVERSITIES}) + ["Atlantis"]
+    return [
+        Student(
+            name=f"Student {i}",
+            cgpa=round(rng.uniform(6.0, 10.0), 1),
+            ielts=rng.choice([5.5, 6.0, 6.5, 7.0, 7.5, 8.0]),
+            budget=rng.randrange(5000, 70000, 500),
+            country=rng.choice(countries).lower() if i % 4 == 0 else rng.choice(countries),
+            field=rng.choice(PROGRAMS),
+            career_goal="Engineer",
+        )
+        for i in range(count)
+    ]
+
+
+def summary(top_k):
+    return [(item["university"].id,) + tuple(item[metric] for metric in METRICS) for item in top_k]
+
+
+def assert_backends_agree(students, cols, k):
+    batch = _score_numpy_batch(students, cols, k)
+    assert len(batch) == len(students)
+    for student, batch_top in zip(students, batch):
+        expected = summary(_score_python(student, cols, k))
+        assert len(expected) == min(k, len(cols))
+        assert summary(_score_numpy(student, cols, k)) == expected
+        assert summary(batch_top) == expected
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("k", [1, 3, 5, 20, 500])
+def test_backends_agree(seed, k):
+    cols = synthetic_catalog(300, seed)
+    assert_backends_agree(synthetic_students(25, seed), cols, k)
+
+
+def test_ties_keep_catalog_order():
+    cols = synthetic_catalog(60, 7)
+    student = synthetic_students(1, 7)[0]
+    top = _score_numpy(student, cols, len(cols))
+    scores = [item["final_score"] for item in top]
+    ids = [item["university"].id for item in top]
+    tied = [(a, b) for a, b, s, t in zip(ids, ids[1:], scores, scores[1:]) if s == t]
+    assert tied, "catalog should contain tied scores"
+    assert all(a < b for a, b in tied)
+    assert summary(top) == summary(_score_python(student, cols, len(cols)))
+
+
+@pytest.mark.parametrize("k", [1, 5, 50])
+def test_backends_agree_in_strict_mode(k):
+    cols = synthetic_catalog(400, 3)
+    index = CatalogIndex(cols)
+    for student in synthetic_students(30, 3):
+        candidates = cols.take(index.strict_candidates(student))
+        assert_backends_agree([student], candidates, k)
+
+
+def test_batch_chunks_match_single_scoring(monkeypatch):
+    # Force several row chunks through the students x universities matrix
+    monkeypatch.setattr(engine, "BATCH_MATRIX_CELLS", 500)
+    cols = synthetic_catalog(120, 4)
+    assert_backends_agree(synthetic_students(17, 4), cols, 5)
@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from data import STATIC_UNIVERSITIES, upsert_universities  # noqa: E402
+from models import University  # noqa: E402
+from sync import NUMERIC_FIELDS, MongoSync, load_checkpoint  # noqa: E402
+
+START = datetime(2024, 1, 1)
+
+
+def document(name, country, at, **fields):
+    values = {field: 1.0 for field in NUMERIC_FIELDS}
+    values["ranking"] = 100
+    values.update(fields)
+    return dict(values, name=name, country=country, program="Computer Science", updated_at=at)
+
+
+def rows(session_factory):
+    with session_factory() as db:
+        return {u.name: u for u in db.query(University)}
+
+
+@pytest.fixture
+def collection():
+    return mongomock_motor.AsyncMongoMockClient()["eduintel"]["universities"]
+
+
+@pytest.fixture
+def sync(collection, session_factory):
+    return MongoSync(collection, session_factory, batch_size=2)
+
+
+def test_polling_resumes_after_checkpoint(collection, sync, session_factory):
+    # Three documents share one updated_at, so resuming mid-tie needs the _id
+    asyncio.run(collection.insert_many([
+        document(f"University {i}", "France", START + timedelta(seconds=i // 3)) for i in range(5)
+    ]))
+    assert asyncio.run(sync.poll_once()) == 5
+    assert len(rows(session_factory)) == 5
+    with session_factory() as db:
+        assert load_checkpoint(db)["updated_at"] == START + timedelta(seconds=1)
+
+    assert asyncio.run(sync.poll_once()) == 0
+
+    later = START + timedelta(minutes=1)
+    asyncio.run(collection.update_one({"name": "University 0"}, {"$set": {"tuition": 42.0, "updated_at": later}}))
+    asyncio.run(collection.insert_one(document("University 5", "France", later)))
+    assert asyncio.run(sync.poll_once()) == 2
+    synced = rows(session_factory)
+    assert synced["University 0"].tuition == 42.0
+    assert "University 5" in synced
+
+
+def test_deletes_are_not_propagated(collection, sync, session_factory):
+    asyncio.run(collection.insert_one(document("Gone University", "France", START)))
+    asyncio.run(sync.poll_once())
+    asyncio.run(collection.delete_one({"name": "Gone University"}))
+    assert asyncio.run(sync.poll_once()) == 0
+    assert "Gone University" in rows(session_factory)
+
+
+def test_name_collision_in_another_country_is_skipped(collection, sync, session_factory):
+    eth = next(u for u in STATIC_UNIVERSITIES if u["name"] == "ETH Zurich")
+    with session_factory() as db:
+        upsert_universities(db, [eth])
+    asyncio.run(collection.insert_one(document("ETH Zurich", "Germany", START, tuition=1.0)))
+    asyncio.run(sync.poll_once())
+    stored = rows(session_factory)["ETH Zurich"]
+    assert (stored.country, stored.tuition) == ("Switzerland", eth["tuition"])
+    assert sync.rows_written == 0
+
+
+def test_incomplete_universities_wait_for_real_data(collection, sync, session_factory):
+    asyncio.run(collection.insert_one({"name": "Partial University", "country": "France", "updated_at": START}))
+    asyncio.run(sync.poll_once())
+    assert "Partial University" not in rows(session_factory)
+
+    asyncio.run(collection.replace_one(
+        {"name": "Partial University"},
+        document("Partial University", "France", START + timedelta(minutes=1), tuition=7.0),
+    ))
+    asyncio.run(sync.poll_once())
+    assert rows(session_factory)["Partial University"].tuition == 7.0